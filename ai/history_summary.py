@@ -0,0 +1,91 @@
+"""
+Rolling summary of old chat history.
+
+When a chat's history comes within HISTORY_TRIM_BLOCK messages of
+MAX_HISTORY_LENGTH (or reaches 3/4 of the HISTORY_MAX_CHARS text budget),
+the oldest block of messages is condensed by a cheap model into one system
+message at the head of the history instead of being dropped outright.
+Starting a block early leaves a few turns for the summary to land before
+get_chat_history starts trimming. Runs in the background after the reply;
+enabled by HISTORY_SUMMARY_MODEL.
+"""
+
+import asyncio
+from config import (
+    MAX_HISTORY_LENGTH,
+    HISTORY_TRIM_BLOCK,
+    HISTORY_MAX_CHARS,
+    HISTORY_SUMMARY_MODEL,
+    HISTORY_SUMMARY_MAX_TOKENS,
+)
+from core.openai_client import client, openai_sem
+from core.telegram import app_logger
+from storage.chat_history import get_chat_history, replace_chat_history_prefix, history_chars
+
+SUMMARY_PREFIX = "Краткое содержание предыдущей части разговора:\n"
+
+_SUMMARY_INSTRUCTIONS = (
+    "Summarize the conversation below in the language it is written in. "
+    "Keep facts, names, decisions, user preferences and open questions; "
+    "drop greetings and filler. If it starts with an earlier summary, merge it in. "
+    "Answer with the summary only, at most a few short paragraphs."
+)
+
+# Summarize a block before the count trim in get_chat_history would drop it
+_SUMMARY_START_LENGTH = max(MAX_HISTORY_LENGTH - HISTORY_TRIM_BLOCK, 1)
+
+# Running summary tasks (strong refs until done): {chat_id: asyncio.Task}
+_summary_tasks = {}
+
+
+def schedule_history_summary(chat_id, history):
+    """Start summarizing old messages in the background if history is about to overflow"""
+    if not HISTORY_SUMMARY_MODEL or chat_id in _summary_tasks:
+        return
+    near_char_budget = HISTORY_MAX_CHARS and history_chars(history) * 4 >= HISTORY_MAX_CHARS * 3
+    if len(history) < _SUMMARY_START_LENGTH and not near_char_budget:
+        return
+    task = asyncio.create_task(_summarize_history(chat_id))
+    _summary_tasks[chat_id] = task
+    task.add_done_callback(lambda _: _summary_tasks.pop(chat_id, None))
+
+
+async def _summarize_history(chat_id):
+    """Replace the oldest block of history (and previous summary) with a summary"""
+    try:
+        history = list(await get_chat_history(chat_id))
+
+        end = HISTORY_TRIM_BLOCK + (1 if history and history[0].get("role") == "system" else 0)
+        # Keep the remaining window starting with a user turn
+        while end < len(history) and history[end].get("role") != "user":
+            end += 1
+        if end >= len(history):
+            return
+        old_messages = history[:end]
+
+        transcript = "\n\n".join(f"{m['role']}: {m['content']}" for m in old_messages)
+        async with openai_sem:
+            completion = await client.chat.completions.create(
+                model=HISTORY_SUMMARY_MODEL,
+                messages=[
+                    {"role": "system", "content": _SUMMARY_INSTRUCTIONS},
+                    {"role": "user", "content": transcript},
+                ],
+                max_tokens=HISTORY_SUMMARY_MAX_TOKENS,
+            )
+        summary = completion.choices[0].message.content
+        if not summary:
+            return
+
+        # Replace only the summarized prefix of the latest history: turns saved
+        # while we waited stay. If it was cleared or trimmed meanwhile, skip.
+        summary_message = {"role": "system", "content": SUMMARY_PREFIX + summary}
+        if not await replace_chat_history_prefix(chat_id, old_messages, [summary_message]):
+            app_logger.info("History changed during summarization, skipping: chat_id=%s", chat_id)
+            return
+        app_logger.info(
+            "History summarized: chat_id=%s, messages=%d, summary_length=%d",
+            chat_id, len(old_messages), len(summary)
+        )
+    except Exception as e:
+        app_logger.error(f"History summarization failed: chat_id={chat_id}, error={e}")
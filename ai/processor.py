@@ -2,162 +2,334 @@
 AI message processing with MCP tool support.
 """
 
+import asyncio
 import base64
+import itertools
 import time
-from config import MAX_HISTORY_LENGTH, MAX_VISION_TOKENS, MCP_MAX_ITERATIONS, API_MAX_RETRIES, DEFAULT_SYSTEM_PROMPT
-from core.openai_client import client
+import uuid
+from openai import BadRequestError
+from openai.types.chat import ChatCompletionMessage
+from config import (
+    MAX_VISION_TOKENS,
+    VISION_IMAGE_URLS,
+    MCP_MAX_ITERATIONS,
+    API_MAX_RETRIES,
+    DEFAULT_SYSTEM_PROMPT,
+    STREAM_EDIT_INTERVAL_SECONDS,
+)
+from core.openai_client import client, openai_sem
 from core.telegram import app_logger
-from storage.chat_history import get_chat_history, save_chat_history, clear_chat_history
-from storage.user_settings import get_user_model, should_use_mcp_for_user, get_user_system_prompt
+from storage.chat_history import get_chat_history, append_chat_history, clear_chat_history
+from storage.images import upload_image, delete_image
+from storage.user_settings import get_user_settings, DEFAULT_MODEL
 from ai.tool_executor import ToolExecutor
+from ai.history_summary import schedule_history_summary
+from utils.coalesce import coalesce
 
 # Global MCP manager instance (set from bot.py)
 mcp_manager = None
 
+# System message used when the user has no custom prompt
+_DEFAULT_SYSTEM_MESSAGE = {"role": "system", "content": DEFAULT_SYSTEM_PROMPT}
 
-async def process_text_message(text, chat_id, image_content=None):
+_JPEG_DATA_URL_PREFIX = b"data:image/jpeg;base64,"
+
+# Background deletions of uploaded images (strong refs until done)
+_image_delete_tasks = set()
+
+
+async def process_text_message(text, chat_id, image_content=None, on_partial=None):
     """
     Process text message with AI, supporting vision and MCP tools.
 
+    If on_partial is given, the first completion is streamed and
+    on_partial(text_so_far) is called at most every STREAM_EDIT_INTERVAL_SECONDS.
+    It must return immediately (no network I/O): it runs while the OpenAI
+    concurrency slot is held and the stream is being read.
+
     Returns AI response as string.
     """
+    # Load history and user settings concurrently
+    history, settings = await asyncio.gather(
+        get_chat_history(chat_id),  # already trimmed to MAX_HISTORY_LENGTH
+        coalesce(("settings", chat_id), lambda: asyncio.to_thread(get_user_settings, chat_id)),
+    )
+
+    # MCP tools only for users who have them enabled (avoids MCP connects/refreshes otherwise)
+    tools_param = await _get_mcp_tools() if settings.get("mcp_enabled", True) else None
+
     # Если есть изображение, используем vision модель
     if image_content is not None:
         model = "gpt-4-vision-preview"
     else:
-        model = get_user_model(chat_id)
+        model = settings.get("model", DEFAULT_MODEL)
 
-    app_logger.info(f"Processing message: chat_id={chat_id}, model={model}, has_image={image_content is not None}, text='{text[:200]}...'")
+    app_logger.info(
+        "Processing message: chat_id=%s, model=%s, has_image=%s, text='%.200s...'",
+        chat_id, model, image_content is not None, text
+    )
 
     max_tokens = None
 
-    # Read current chat history
-    history = get_chat_history(chat_id)
-
-    # Limit history length to prevent memory overflow and reduce API costs
-    if len(history) > MAX_HISTORY_LENGTH:
-        old_length = len(history)
-        # Keep only the last MAX_HISTORY_LENGTH messages
-        history = history[-MAX_HISTORY_LENGTH:]
-        app_logger.info(
-            f"History trimmed: chat_id={chat_id}, "
-            f"old_length={old_length}, new_length={len(history)}"
-        )
-
-    history_text_only = history.copy()
-    history_text_only.append({"role": "user", "content": text})
-
     # Add system message (use custom user prompt or default)
-    user_prompt = get_user_system_prompt(chat_id)
-    system_prompt_content = user_prompt if user_prompt else DEFAULT_SYSTEM_PROMPT
-
-    system_message = {
-        "role": "system",
-        "content": system_prompt_content
-    }
-    history = [system_message] + history
-
+    user_prompt = settings.get("system_prompt")
     if user_prompt:
-        app_logger.info(f"Using custom system prompt for chat_id={chat_id}, length={len(user_prompt)}")
+        system_message = {"role": "system", "content": user_prompt}
+        app_logger.info("Using custom system prompt for chat_id=%s, length=%d", chat_id, len(user_prompt))
     else:
-        app_logger.info(f"Using default system prompt for chat_id={chat_id}")
+        system_message = _DEFAULT_SYSTEM_MESSAGE
+        app_logger.info("Using default system prompt for chat_id=%s", chat_id)
 
+    image_key = None  # S3 key of the uploaded image, deleted when done
     if image_content is not None:
-        model = "gpt-4-vision-preview"
         max_tokens = MAX_VISION_TOKENS
-        base64_image_content = base64.b64encode(image_content).decode("utf-8")
-        base64_image_content = f"data:image/jpeg;base64,{base64_image_content}"
-        history.append(
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": text},
-                    {"type": "image_url", "image_url": {"url": base64_image_content}},
-                ],
-            }
-        )
+        image_url, image_key = await _get_image_url(chat_id, image_content)
+        user_message = {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": text},
+                {"type": "image_url", "image_url": {"url": image_url}},
+            ],
+        }
     else:
-        history.append({"role": "user", "content": text})
+        user_message = {"role": "user", "content": text}
 
-    # Get MCP tools if enabled
-    tools_param = None
-    if mcp_manager and should_use_mcp_for_user(chat_id):
-        try:
-            tools_param = await mcp_manager.get_all_tools()
-            app_logger.info(f"MCP tools available: {len(tools_param)} tools")
-        except Exception as e:
-            app_logger.error(f"MCP failed, continuing without tools: {e}")
-            tools_param = None  # Graceful degradation
+    # Rolling summary of older history (leading system message) goes into the system prompt
+    history_start = 0
+    if history and history[0].get("role") == "system":
+        system_message = {"role": "system", "content": f"{system_message['content']}\n\n{history[0]['content']}"}
+        history_start = 1
 
-    try:
-        start_time = time.time()
-        app_logger.info(f"API request started: chat_id={chat_id}, model={model}, messages={len(history)}, tools={len(tools_param) if tools_param else 0}")
-
-        chat_completion = client.chat.completions.create(
-            model=model,
-            messages=history,
-            max_tokens=max_tokens,
-            tools=tools_param,
-            tool_choice="auto" if tools_param else None
-        )
-
-        duration = time.time() - start_time
-        app_logger.info(f"API response received: chat_id={chat_id}, model={model}, duration={duration:.2f}s")
-    except Exception as e:
-        app_logger.error(f"API error: chat_id={chat_id}, model={model}, error={str(e)}")
-        if type(e).__name__ == "BadRequestError":
-            for attempt in range(API_MAX_RETRIES):
-                try:
-                    app_logger.warning(
-                        f"BadRequestError, clearing history and retrying: attempt={attempt + 1}/{API_MAX_RETRIES}, chat_id={chat_id}"
-                    )
-                    clear_chat_history(chat_id)
+    # Messages sent to the API. Keep the order stable (system, history, new turn)
+    # and only ever append (tool loop does so in-place) so the prefix stays cacheable
+    messages = [system_message, *itertools.islice(history, history_start, None), user_message]
 
-                    retry_start = time.time()
-                    app_logger.info(f"API retry request started: chat_id={chat_id}, model={model}, attempt={attempt + 1}")
+    # Uploaded image is needed only until the completion (and tool loop) is done
+    try:
+        try:
+            start_time = time.time()
+            app_logger.info(
+                "API request started: chat_id=%s, model=%s, messages=%d, tools=%d",
+                chat_id, model, len(messages), len(tools_param) if tools_param else 0
+            )
 
-                    chat_completion = client.chat.completions.create(
+            async with openai_sem:
+                if on_partial is not None:
+                    message = await _stream_completion(model, messages, max_tokens, tools_param, on_partial)
+                else:
+                    chat_completion = await client.chat.completions.create(
                         model=model,
-                        messages=[system_message, {"role": "user", "content": text}],
+                        messages=messages,
                         max_tokens=max_tokens,
                         tools=tools_param,
                         tool_choice="auto" if tools_param else None
                     )
+                    message = chat_completion.choices[0].message
 
-                    retry_duration = time.time() - retry_start
-                    app_logger.info(f"API retry response received: chat_id={chat_id}, model={model}, duration={retry_duration:.2f}s")
-                    break
-                except Exception as retry_exc:
-                    if attempt == API_MAX_RETRIES - 1:
-                        app_logger.error(
-                            f"Retries exhausted for BadRequestError: chat_id={chat_id}, error={retry_exc}"
-                        )
-                        return "Произошла ошибка при обработке запроса. Попробуйте позже."
-            else:
+            duration = time.time() - start_time
+            app_logger.info("API response received: chat_id=%s, model=%s, duration=%.2fs", chat_id, model, duration)
+        except BadRequestError as e:
+            app_logger.error(f"API error: chat_id={chat_id}, model={model}, error={str(e)}")
+            messages = [system_message, {"role": "user", "content": text}]
+            chat_completion = await _retry_after_history_clear(
+                chat_id, messages, model, max_tokens, tools_param
+            )
+            if chat_completion is None:
                 return "Произошла ошибка при обработке запроса. Попробуйте позже."
+            message = chat_completion.choices[0].message
+        except Exception as e:
+            app_logger.error(f"API error: chat_id={chat_id}, model={model}, error={str(e)}")
+            raise
+
+        # Tool calling loop (extracted to ToolExecutor)
+        if message.tool_calls:
+            tool_executor = ToolExecutor(mcp_manager, client, max_iterations=MCP_MAX_ITERATIONS)
+            ai_response, max_iterations_reached = await tool_executor.execute_tool_loop(
+                message, messages, model, max_tokens, tools_param
+            )
         else:
-            raise e
+            # No tool calls - use message content directly
+            ai_response = message.content if message.content else "No response."
+    finally:
+        if image_key is not None:
+            _schedule_image_delete(image_key)
 
-    # Tool calling loop (extracted to ToolExecutor)
-    message = chat_completion.choices[0].message
+    app_logger.info(
+        "AI response: chat_id=%s, model=%s, response_length=%d, response_preview='%.200s...'",
+        chat_id, model, len(ai_response), ai_response
+    )
 
-    if message.tool_calls:
-        tool_executor = ToolExecutor(mcp_manager, client, max_iterations=MCP_MAX_ITERATIONS)
-        ai_response, max_iterations_reached = await tool_executor.execute_tool_loop(
-            message, history, model, max_tokens, tools_param
-        )
-    else:
-        # No tool calls - use message content directly
-        ai_response = message.content if message.content else "No response."
+    # Append the new turn to the latest stored history (not our stale copy:
+    # a summary or /clear may have replaced it while the model was answering)
+    history = await append_chat_history(chat_id, [
+        {"role": "user", "content": text},
+        {"role": "assistant", "content": ai_response},
+    ])
+    schedule_history_summary(chat_id, history)
 
-    history_text_only.append({"role": "assistant", "content": ai_response})
+    return ai_response
 
-    app_logger.info(
-        f"AI response: chat_id={chat_id}, model={model}, "
-        f"response_length={len(ai_response)}, response_preview='{ai_response[:200]}...'"
+
+async def _stream_completion(model, messages, max_tokens, tools_param, on_partial):
+    """
+    Streaming chat completion.
+
+    Content deltas are reported to on_partial (throttled, so short answers
+    produce no intermediate updates); tool call deltas are accumulated.
+    Returns the assembled assistant message, same as a non-streamed response.
+    """
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        tools=tools_param,
+        tool_choice="auto" if tools_param else None,
+        stream=True,
     )
 
-    # Save current chat history
-    save_chat_history(chat_id, history_text_only)
+    content_parts = []
+    tool_calls = {}  # {index: tool call dict}
+    last_update = time.monotonic()
 
-    return ai_response
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+
+        if delta.content:
+            content_parts.append(delta.content)
+            now = time.monotonic()
+            if now - last_update >= STREAM_EDIT_INTERVAL_SECONDS:
+                last_update = now
+                on_partial("".join(content_parts))
+
+        for tool_call in delta.tool_calls or ():
+            call = tool_calls.setdefault(
+                tool_call.index,
+                {"id": None, "type": "function", "function": {"name": "", "arguments": ""}},
+            )
+            if tool_call.id:
+                call["id"] = tool_call.id
+            if tool_call.function:
+                if tool_call.function.name:
+                    call["function"]["name"] += tool_call.function.name
+                if tool_call.function.arguments:
+                    call["function"]["arguments"] += tool_call.function.arguments
+
+    return ChatCompletionMessage.model_validate({
+        "role": "assistant",
+        "content": "".join(content_parts) or None,
+        "tool_calls": _complete_tool_calls(tool_calls) or None,
+    })
+
+
+def _complete_tool_calls(tool_calls):
+    """
+    Tool calls assembled from stream deltas, in order, made valid.
+
+    Some providers stream a tool call without an id: one is generated (it
+    only has to match the tool result we send back). Calls without a
+    function name can't be executed and are dropped.
+    """
+    completed = []
+    for index in sorted(tool_calls):
+        call = tool_calls[index]
+        if not call["function"]["name"]:
+            app_logger.warning("Dropping streamed tool call without function name: index=%s", index)
+            continue
+        if not call["id"]:
+            call["id"] = f"call_{uuid.uuid4().hex}"
+        completed.append(call)
+    return completed
+
+
+async def _get_mcp_tools():
+    """Get MCP tools list, or None if MCP is disabled or unavailable"""
+    if not mcp_manager:
+        return None
+    try:
+        tools = await mcp_manager.get_all_tools()
+        app_logger.info("MCP tools available: %d tools", len(tools))
+        return tools
+    except Exception as e:
+        app_logger.error(f"MCP failed, continuing without tools: {e}")
+        return None  # Graceful degradation
+
+
+async def _get_image_url(chat_id, image_content):
+    """
+    URL of the image for the vision model, and S3 key of the uploaded image (or None).
+
+    Presigned S3 URL if VISION_IMAGE_URLS is enabled (no base64 inflation
+    of the request), otherwise (or if upload fails) a base64 data URL.
+    """
+    if VISION_IMAGE_URLS:
+        try:
+            return await asyncio.to_thread(upload_image, chat_id, image_content)
+        except Exception as e:
+            app_logger.error(f"Image upload failed, falling back to base64: chat_id={chat_id}, error={e}")
+
+    # Build data URL in bytes and decode once (base64 is pure ASCII)
+    return (_JPEG_DATA_URL_PREFIX + base64.b64encode(image_content)).decode("ascii"), None
+
+
+def _schedule_image_delete(key):
+    """Удалить загруженное изображение из S3 фоновой задачей (best-effort)"""
+    task = asyncio.create_task(_delete_image(key))
+    _image_delete_tasks.add(task)
+    task.add_done_callback(_image_delete_tasks.discard)
+
+
+async def _delete_image(key):
+    try:
+        await asyncio.to_thread(delete_image, key)
+    except Exception as e:
+        app_logger.warning(f"Failed to delete uploaded image {key}: {e}")
+
+
+async def _retry_after_history_clear(chat_id, messages, model, max_tokens, tools_param):
+    """
+    Clear stored chat history and retry the API request without it.
+
+    Used when the API rejects the request (BadRequestError), usually
+    because the accumulated history is too long or malformed.
+
+    Returns the chat completion, or None if all retries failed.
+    """
+    app_logger.warning("BadRequestError, clearing history and retrying: chat_id=%s", chat_id)
+    try:
+        await clear_chat_history(chat_id)
+    except Exception as clear_exc:
+        app_logger.error(f"Failed to clear history before retry: chat_id={chat_id}, error={clear_exc}")
+
+    for attempt in range(API_MAX_RETRIES):
+        try:
+            retry_start = time.time()
+            app_logger.info("API retry request started: chat_id=%s, model=%s, attempt=%d", chat_id, model, attempt + 1)
+
+            async with openai_sem:
+                chat_completion = await client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    tools=tools_param,
+                    tool_choice="auto" if tools_param else None
+                )
+
+            retry_duration = time.time() - retry_start
+            app_logger.info(
+                "API retry response received: chat_id=%s, model=%s, duration=%.2fs",
+                chat_id, model, retry_duration
+            )
+            return chat_completion
+        except Exception as retry_exc:
+            if attempt == API_MAX_RETRIES - 1:
+                app_logger.error(
+                    f"Retries exhausted for BadRequestError: chat_id={chat_id}, error={retry_exc}"
+                )
+            else:
+                app_logger.warning(
+                    "API retry failed: chat_id=%s, attempt=%d/%d, error=%s",
+                    chat_id, attempt + 1, API_MAX_RETRIES, retry_exc
+                )
+    return None
@@ -4,9 +4,17 @@ Tool execution handler for MCP (Model Context Protocol).
 Handles iterative tool calling loop with OpenAI API.
 """
 
-import json
+import asyncio
+import logging
 import time
 from core.telegram import app_logger
+from core.openai_client import openai_sem
+from utils.serialization import json_loads, json_dumps
+
+
+def _cheap_len(result):
+    """Length of a tool result for logging, without stringifying it (-1 if unknown)"""
+    return len(result) if isinstance(result, (str, bytes, list, dict)) else -1
 
 
 class ToolExecutor:
@@ -25,7 +33,7 @@ class ToolExecutor:
 
         Args:
             mcp_manager: MCP server manager instance
-            client: OpenAI client instance
+            client: AsyncOpenAI client instance
             max_iterations: Maximum tool call iterations (default: 5)
         """
         self.mcp_manager = mcp_manager
@@ -51,35 +59,50 @@ class ToolExecutor:
 
         while message.tool_calls and iteration < self.max_iterations:
             iteration += 1
-            app_logger.info(
-                f"Tool calls (iteration {iteration}): "
-                f"{[tc.function.name for tc in message.tool_calls]}"
-            )
+            if app_logger.isEnabledFor(logging.INFO):
+                app_logger.info(
+                    "Tool calls (iteration %d): %s",
+                    iteration, [tc.function.name for tc in message.tool_calls]
+                )
 
             # Add assistant message with tool calls to history
             self._add_tool_call_to_history(history, message)
 
-            # Execute each tool call
-            for tool_call in message.tool_calls:
-                result = await self._execute_single_tool_call(tool_call)
+            # Execute all tool calls concurrently, keep results in tool_call order
+            results = await asyncio.gather(
+                *[self._execute_single_tool_call(tc) for tc in message.tool_calls],
+                return_exceptions=True
+            )
+            for tool_call, result in zip(message.tool_calls, results):
+                if isinstance(result, Exception):
+                    error_msg = f"Error executing tool {tool_call.function.name}: {str(result)}"
+                    app_logger.error(error_msg)
+                    result = {"error": error_msg}
                 self._add_tool_result_to_history(history, tool_call, result)
 
             # Get next response from API with tool results
             try:
                 start_time = time.time()
-                app_logger.info(f"API request started (iteration {iteration}): model={model}, messages={len(history)}, tools={len(tools_param) if tools_param else 0}")
-
-                chat_completion = self.client.chat.completions.create(
-                    model=model,
-                    messages=history,
-                    max_tokens=max_tokens,
-                    tools=tools_param,
-                    tool_choice="auto" if tools_param else None
+                app_logger.info(
+                    "API request started (iteration %d): model=%s, messages=%d, tools=%d",
+                    iteration, model, len(history), len(tools_param) if tools_param else 0
                 )
 
+                async with openai_sem:
+                    chat_completion = await self.client.chat.completions.create(
+                        model=model,
+                        messages=history,
+                        max_tokens=max_tokens,
+                        tools=tools_param,
+                        tool_choice="auto" if tools_param else None
+                    )
+
                 duration = time.time() - start_time
                 message = chat_completion.choices[0].message
-                app_logger.info(f"API response received (iteration {iteration}): model={model}, duration={duration:.2f}s, has_tool_calls={bool(message.tool_calls)}")
+                app_logger.info(
+                    "API response received (iteration %d): model=%s, duration=%.2fs, has_tool_calls=%s",
+                    iteration, model, duration, bool(message.tool_calls)
+                )
             except Exception as e:
                 app_logger.error(f"API error during tool call iteration: {e}")
                 break
@@ -87,9 +110,7 @@ class ToolExecutor:
         # Check if we hit max iterations
         max_iterations_reached = iteration >= self.max_iterations
         if max_iterations_reached:
-            app_logger.warning(
-                f"Max tool call iterations ({self.max_iterations}) reached"
-            )
+            app_logger.warning("Max tool call iterations (%d) reached", self.max_iterations)
 
         # Extract final response
         final_response = (
@@ -110,13 +131,11 @@ class ToolExecutor:
             Tool execution result (str or dict)
         """
         tool_name = tool_call.function.name
-        tool_args = json.loads(tool_call.function.arguments)
+        tool_args = json_loads(tool_call.function.arguments)
 
         try:
             result = await self.mcp_manager.execute_tool(tool_name, tool_args)
-            app_logger.info(
-                f"Tool executed: {tool_name}, result_length={len(str(result))}"
-            )
+            app_logger.info("Tool executed: %s, result_length=%d", tool_name, _cheap_len(result))
             return result
 
         except Exception as e:
@@ -132,20 +151,11 @@ class ToolExecutor:
             history: Conversation history (modified in-place)
             message: OpenAI message with tool_calls
         """
+        # Serialize SDK tool call objects in one pass ({id, type, function: {name, arguments}})
         history.append({
             "role": "assistant",
             "content": message.content,
-            "tool_calls": [
-                {
-                    "id": tc.id,
-                    "type": "function",
-                    "function": {
-                        "name": tc.function.name,
-                        "arguments": tc.function.arguments
-                    }
-                }
-                for tc in message.tool_calls
-            ]
+            "tool_calls": message.model_dump(include={"tool_calls"}, exclude_none=True)["tool_calls"]
         })
 
     def _add_tool_result_to_history(self, history, tool_call, result):
@@ -159,7 +169,7 @@ class ToolExecutor:
         """
         # Convert result to string if needed
         if isinstance(result, dict):
-            content = json.dumps(result)
+            content = json_dumps(result)
         elif isinstance(result, str):
             content = result
         else:
@@ -2,11 +2,16 @@
 Access control (authorization checks).
 """
 
-from config import ADMIN_USERNAME
-from auth.user_manager import register_user, get_user_status
+from config import ADMIN_USERNAME_LOWER
+from auth.user_manager import register_user, is_user_approved
 from core.telegram import bot, app_logger
 
 
+def _is_admin_username(username_lower):
+    """Сравнение уже приведённого к нижнему регистру username с админом"""
+    return username_lower == ADMIN_USERNAME_LOWER
+
+
 def should_process_message(message):
     """
     Синхронная быстрая проверка для фильтрации в декораторах.
@@ -18,12 +23,12 @@ def should_process_message(message):
         return False
 
     # Админ всегда имеет доступ
-    if username.lower() == ADMIN_USERNAME.lower():
+    username_lower = username.lower()
+    if _is_admin_username(username_lower):
         return True
 
     # Проверяем статус пользователя
-    status = get_user_status(username)
-    return status == "approved"
+    return is_user_approved(username_lower)
 
 
 async def is_authorized(message):
@@ -38,12 +43,13 @@ async def is_authorized(message):
         )
         return False
 
-    # Админ всегда имеет доступ
-    if username.lower() == ADMIN_USERNAME.lower():
+    # Админ и одобренные пользователи: проверка по кешу в памяти, без обращения к БД
+    username_lower = username.lower()
+    if _is_admin_username(username_lower) or is_user_approved(username_lower):
         return True
 
     # Регистрируем/проверяем пользователя
-    status = register_user(username, message.chat.id)
+    status = await register_user(username, message.chat.id)
 
     # Проверка на invalid_username
     if status == "invalid_username":
@@ -55,4 +61,4 @@ async def is_authorized(message):
 def is_admin(message):
     """Проверка - является ли пользователь админом"""
     username = message.from_user.username
-    return username and username.lower() == ADMIN_USERNAME.lower()
+    return bool(username) and _is_admin_username(username.lower())
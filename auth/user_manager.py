@@ -2,8 +2,11 @@
 User management (registration, status tracking).
 """
 
+import asyncio
+import threading
+import time
 from datetime import datetime
-from config import ADMIN_CHAT_ID, ADMIN_USERNAME
+from config import ADMIN_CHAT_ID, ADMIN_USERNAME_LOWER, USERS_DB_CACHE_TTL_SECONDS
 from storage.base import S3Repository
 from auth.validators import validate_username
 from core.telegram import bot, app_logger
@@ -16,24 +19,142 @@ users_db_repo = S3Repository(
 )
 
 
+# Background admin notification tasks (strong refs until done), bounded
+_notify_tasks = set()
+_PENDING_NOTIFY_MAX = 100
+
+# In-process users DB cache: {"etag": str, "data": dict, "expires": monotonic time,
+# "version": bumped on every save, so a refresh started earlier doesn't overwrite it}
+_users_db_cache = {"etag": None, "data": None, "expires": 0.0, "version": 0}
+# Guards swapping the cache (never held across S3 calls: the event loop may wait on it)
+_users_db_lock = threading.Lock()
+# Serializes PUTs of the users DB (worker threads only)
+_users_db_write_lock = threading.Lock()
+# Background revalidation started by is_user_approved (at most one at a time)
+_refresh_task = None
+
+# Lowercased usernames with "approved" status, rebuilt when cached DB changes
+_approved_usernames = frozenset()
+
+
+def _set_cached_users_db(users_db):
+    """Replace cached users DB and rebuild the approved usernames set"""
+    global _approved_usernames
+    _users_db_cache["data"] = users_db
+    if users_db is None:
+        _approved_usernames = frozenset()
+    else:
+        _approved_usernames = frozenset(
+            name for name, user in users_db["users"].items() if user.get("status") == "approved"
+        )
+
+
 def get_users_db():
-    """Получить базу пользователей из S3"""
-    return users_db_repo.get(ADMIN_CHAT_ID)
+    """
+    Получить базу пользователей (из кеша или S3). Блокирующая: из async кода
+    вызывать через asyncio.to_thread.
+
+    Кеш живёт USERS_DB_CACHE_TTL_SECONDS, после чего сверяется с S3
+    по ETag: если объект не менялся, TTL просто продлевается.
+    """
+    if _users_db_cache["data"] is not None and time.monotonic() < _users_db_cache["expires"]:
+        return _users_db_cache["data"]
+    return _refresh_users_db()
+
+
+def _refresh_users_db():
+    """Сверить кеш с S3 (запрос идёт без блокировки, lock только на замену кеша)"""
+    with _users_db_lock:
+        version = _users_db_cache["version"]
+        etag = _users_db_cache["etag"] if _users_db_cache["data"] is not None else None
+
+    try:
+        data, new_etag = users_db_repo.get_if_changed(ADMIN_CHAT_ID, etag)
+    except Exception:
+        with _users_db_lock:
+            # Keep serving the stale copy, don't retry S3 on every message
+            if _users_db_cache["data"] is not None:
+                _users_db_cache["expires"] = time.monotonic() + USERS_DB_CACHE_TTL_SECONDS
+        raise
+
+    with _users_db_lock:
+        # A save during the GET is newer than what we fetched, keep it
+        if _users_db_cache["version"] == version:
+            if data is not None:
+                _set_cached_users_db(data)
+            _users_db_cache["etag"] = new_etag
+            _users_db_cache["expires"] = time.monotonic() + USERS_DB_CACHE_TTL_SECONDS
+        return _users_db_cache["data"]
 
 
 def save_users_db(users_db):
-    """Сохранить базу пользователей в S3"""
-    return users_db_repo.save(ADMIN_CHAT_ID, users_db)
+    """Сохранить базу пользователей в S3 (и обновить кеш)"""
+    with _users_db_write_lock:
+        success = users_db_repo.save(ADMIN_CHAT_ID, users_db)
+        with _users_db_lock:
+            _users_db_cache["version"] += 1
+            if success:
+                _set_cached_users_db(users_db)
+                # ETag of the new object is unknown, force a full GET after TTL
+                _users_db_cache["etag"] = None
+                _users_db_cache["expires"] = time.monotonic() + USERS_DB_CACHE_TTL_SECONDS
+            else:
+                # Cached dict may have been mutated by the caller: re-read it in full
+                # (the approved set stays as it was, so approved users aren't locked out)
+                _users_db_cache["etag"] = None
+                _users_db_cache["expires"] = 0.0
+    return success
+
+
+def is_user_approved(username_lower):
+    """
+    Быстрая проверка (O(1), без обхода БД и без I/O): одобрен ли пользователь.
+
+    Вызывается синхронно из фильтра сообщений в event loop, поэтому всегда
+    отвечает по кешу, даже устаревшему; устаревший кеш сверяется с S3 в фоне.
+    """
+    if time.monotonic() >= _users_db_cache["expires"]:
+        _schedule_users_db_refresh()
+    return username_lower in _approved_usernames
+
+
+def _schedule_users_db_refresh():
+    """Запустить фоновую сверку кеша с S3, если она ещё не идёт"""
+    global _refresh_task
+    if _refresh_task is not None and not _refresh_task.done():
+        return
+    try:
+        _refresh_task = asyncio.get_running_loop().create_task(_refresh_users_db_async())
+    except RuntimeError:
+        # Called from a worker thread: the next call from the event loop will refresh
+        pass
+
+
+async def _refresh_users_db_async():
+    try:
+        await asyncio.to_thread(_refresh_users_db)
+    except Exception as e:
+        app_logger.error(f"Failed to refresh users DB: {e}")
+
+
+async def load_users_db():
+    """Загрузить базу пользователей в кеш (при старте, до приёма сообщений)"""
+    await asyncio.to_thread(get_users_db)
+
 
+async def register_user(username, chat_id):
+    """
+    Зарегистрировать нового пользователя со статусом pending.
 
-def register_user(username, chat_id):
-    """Зарегистрировать нового пользователя со статусом pending"""
+    Обращения к S3 выполняются в потоке (asyncio.to_thread), чтобы не
+    блокировать event loop, пока обрабатываются сообщения других чатов.
+    """
     if not validate_username(username):
         app_logger.warning(f"Invalid username format: {username}")
         return "invalid_username"
 
     username_lower = username.lower()
-    users_db = get_users_db()
+    users_db = await asyncio.to_thread(get_users_db)
 
     # Если пользователь уже есть, возвращаем его статус
     if username_lower in users_db["users"]:
@@ -46,13 +167,39 @@ def register_user(username, chat_id):
         "first_seen": datetime.now().isoformat(),
         "username": username,
     }
-    save_users_db(users_db)
+    await asyncio.to_thread(save_users_db, users_db)
 
     app_logger.info(f"New user registered: {username}, chat_id={chat_id}")
 
-    # Уведомляем админа
+    # Уведомляем админа в фоне, не задерживая ответ пользователю
+    _schedule_admin_notification(username, chat_id)
+
+    return "pending"
+
+
+def _schedule_admin_notification(username, chat_id):
+    """Запустить уведомление админа о новом пользователе фоновой задачей"""
+    if len(_notify_tasks) >= _PENDING_NOTIFY_MAX:
+        app_logger.warning(
+            f"Too many pending admin notifications ({len(_notify_tasks)}), "
+            f"dropping notification for {username}"
+        )
+        return
+
     try:
-        bot.send_message(
+        task = asyncio.get_running_loop().create_task(_notify_admin_new_user(username, chat_id))
+    except RuntimeError:
+        app_logger.error(f"Error notifying admin: no running event loop, user={username}")
+        return
+
+    _notify_tasks.add(task)
+    task.add_done_callback(_notify_tasks.discard)
+
+
+async def _notify_admin_new_user(username, chat_id):
+    """Уведомить админа о новом пользователе"""
+    try:
+        await bot.send_message(
             ADMIN_CHAT_ID,
             f"🔔 *Новый пользователь*\n\n"
             f"👤 Username: `@{username}`\n"
@@ -65,8 +212,6 @@ def register_user(username, chat_id):
     except Exception as e:
         app_logger.error(f"Error notifying admin: {e}")
 
-    return "pending"
-
 
 def get_user_status(username):
     """Получить статус пользователя"""
@@ -76,7 +221,7 @@ def get_user_status(username):
     username_lower = username.lower()
 
     # Админ всегда имеет доступ
-    if username_lower == ADMIN_USERNAME.lower():
+    if username_lower == ADMIN_USERNAME_LOWER:
         return "approved"
 
     users_db = get_users_db()
@@ -85,17 +230,18 @@ def get_user_status(username):
 
 
 def set_user_status(username, status):
-    """Установить статус пользователя"""
+    """Установить статус пользователя; возвращает запись пользователя или None, если не найден"""
     if not username:
-        return False
+        return None
 
     username_lower = username.lower()
     users_db = get_users_db()
 
-    if username_lower not in users_db["users"]:
-        return False
+    user = users_db["users"].get(username_lower)
+    if user is None:
+        return None
 
-    users_db["users"][username_lower]["status"] = status
+    user["status"] = status
     save_users_db(users_db)
     app_logger.info(f"User {username} status changed to: {status}")
-    return True
+    return user
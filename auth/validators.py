@@ -4,6 +4,9 @@ Username validation utilities.
 
 import re
 
+# Начинается с буквы или подчеркивания, далее буквы/цифры/подчеркивания, всего 5-32 символа
+_USERNAME_RE = re.compile(r'[a-zA-Z_][a-zA-Z0-9_]{4,31}')
+
 
 def validate_username(username: str) -> bool:
     """
@@ -18,11 +21,4 @@ def validate_username(username: str) -> bool:
     if not username:
         return False
 
-    if len(username) < 5 or len(username) > 32:
-        return False
-
-    # Regex: начинается с буквы или подчеркивания, далее буквы/цифры/подчеркивания
-    if not re.match(r'^[a-zA-Z_][a-zA-Z0-9_]*$', username):
-        return False
-
-    return True
+    return _USERNAME_RE.fullmatch(username) is not None
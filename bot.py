@@ -4,55 +4,49 @@ Telegram AI Chat Bot - Entry Point
 Async architecture for concurrent request handling.
 """
 
-import os
 import signal
 import asyncio
 from core.telegram import bot, app_logger
 import handlers  # Import to register all handlers
 import ai.processor
+from core.mcp_bootstrap import init_mcp
+from core.webhook import run_webhook
+from auth.user_manager import load_users_db
+from models.model_manager import fetch_models
+from config import HISTORY_WARMUP, POLLING_TIMEOUT_SECONDS, POLLING_ALLOWED_UPDATES, WEBHOOK_URL
+from storage.chat_history import flush_chat_history, warmup_chat_history
 
-# Global flag for graceful shutdown
-shutdown_requested = False
+# Set by signal handlers to stop polling and shut down cooperatively
+shutdown_event = asyncio.Event()
 
-# Initialize MCP Manager (global singleton)
-# Note: warmup is done inside async main() to avoid event loop conflicts
-if os.environ.get("MCP_ENABLED", "false").lower() == "true":
-    try:
-        from mcp_manager import MCPServerManager, load_mcp_configs_from_json
-        from core.async_helpers import run_async
-
-        configs = load_mcp_configs_from_json()
-        ai.processor.mcp_manager = MCPServerManager(configs)
-        app_logger.info(f"MCP Manager initialized with {len(configs)} server configs")
-    except Exception as e:
-        app_logger.error(f"Failed to initialize MCP Manager: {e}")
-        ai.processor.mcp_manager = None
-else:
-    ai.processor.mcp_manager = None
+# Max time for each cleanup step on shutdown
+SHUTDOWN_TIMEOUT_SECONDS = 10
 
 
 # Graceful shutdown handler
 async def shutdown_handler_async():
     """Handle shutdown and cleanup resources"""
-    global shutdown_requested
-
-    if shutdown_requested:
-        return  # Already shutting down
-
-    shutdown_requested = True
     app_logger.info("Initiating graceful shutdown...")
 
-    # Stop bot polling
+    # Close bot HTTP session
     try:
         await bot.close_session()
         app_logger.info("Bot polling stopped")
     except Exception as e:
         app_logger.warning(f"Error stopping bot: {e}")
 
+    # Write pending chat histories to S3
+    try:
+        await asyncio.wait_for(flush_chat_history(), timeout=SHUTDOWN_TIMEOUT_SECONDS)
+    except Exception as e:
+        app_logger.error(f"Error flushing chat histories: {e}")
+
     # Close all MCP sessions
     if ai.processor.mcp_manager is not None:
         try:
-            await ai.processor.mcp_manager.close_all_sessions()
+            await asyncio.wait_for(
+                ai.processor.mcp_manager.close_all_sessions(), timeout=SHUTDOWN_TIMEOUT_SECONDS
+            )
             app_logger.info("All MCP sessions closed")
         except Exception as e:
             app_logger.error(f"Error closing MCP sessions: {e}")
@@ -60,45 +54,68 @@ async def shutdown_handler_async():
     app_logger.info("Shutdown complete")
 
 
-def shutdown_handler(signum, frame):
-    """Signal handler for SIGINT/SIGTERM"""
+def request_shutdown(signum):
+    """Signal handler for SIGINT/SIGTERM (runs inside the event loop)"""
     app_logger.info(f"Received shutdown signal {signum}")
+    shutdown_event.set()
 
-    # Get the current event loop
-    try:
-        loop = asyncio.get_running_loop()
-    except RuntimeError:
-        # No running loop, create a new one for cleanup
-        app_logger.warning("No running event loop found, creating new one for cleanup")
-        asyncio.run(shutdown_handler_async())
-        exit(0)
-        return
 
-    # Schedule shutdown in the current event loop
-    loop.create_task(shutdown_handler_async())
+# Запуск бота в режиме async polling или webhook
+async def main():
+    """Main entry point"""
+    # Register signal handlers in the event loop
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, request_shutdown, sig)
 
-    # Give some time for cleanup before forcing exit
-    loop.call_later(5.0, lambda: exit(0))
+    # Initialize MCP Manager (global singleton) inside the main event loop
+    ai.processor.mcp_manager = await init_mcp()
 
+    # Users DB must be cached before the first message: the sync message filter
+    # only reads the cache (and refreshes it in the background)
+    try:
+        await load_users_db()
+    except Exception as users_db_error:
+        app_logger.warning(f"Failed to preload users DB: {users_db_error}")
 
-# Запуск бота в режиме async polling
-async def main():
-    """Main entry point"""
-    # Register signal handlers
-    signal.signal(signal.SIGINT, shutdown_handler)
-    signal.signal(signal.SIGTERM, shutdown_handler)
+    # Load models list in the background: fills its cache and opens a pooled
+    # keep-alive connection to the API before the first user request
+    models_warmup_task = asyncio.create_task(fetch_models())
 
-    # Warm up MCP cache inside the main event loop (avoids async generator errors)
-    if ai.processor.mcp_manager and os.environ.get("MCP_WARMUP_CACHE", "true").lower() == "true":
+    # Preload recent chat histories so first messages don't wait for S3
+    if HISTORY_WARMUP:
         try:
-            app_logger.info("Warming up MCP tools cache...")
-            tools = await ai.processor.mcp_manager.get_all_tools()
-            app_logger.info(f"Cache warmed up with {len(tools)} tools")
+            app_logger.info("Warming up chat history cache...")
+            loaded = await warmup_chat_history()
+            app_logger.info(f"History cache warmed with {loaded} chats")
         except Exception as warmup_error:
-            app_logger.warning(f"Failed to warm up cache (will retry on first request): {warmup_error}")
-
-    app_logger.info("Бот запущен в async режиме polling...")
-    await bot.infinity_polling()
+            app_logger.warning(f"Failed to warm up history cache: {warmup_error}")
+
+    if WEBHOOK_URL:
+        app_logger.info("Бот запущен в async режиме webhook...")
+        polling_task = asyncio.create_task(run_webhook())
+    else:
+        app_logger.info("Бот запущен в async режиме polling...")
+        # getUpdates doesn't work while a webhook is set (e.g. after switching modes)
+        try:
+            await bot.remove_webhook()
+        except Exception as webhook_error:
+            app_logger.warning(f"Failed to remove webhook before polling: {webhook_error}")
+        polling_task = asyncio.create_task(bot.infinity_polling(
+            timeout=POLLING_TIMEOUT_SECONDS,
+            request_timeout=POLLING_TIMEOUT_SECONDS + 5,
+            allowed_updates=POLLING_ALLOWED_UPDATES,
+        ))
+    stop_task = asyncio.create_task(shutdown_event.wait())
+
+    # Run until a shutdown signal arrives (or polling/webhook exits on its own)
+    await asyncio.wait({polling_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+
+    for task in (polling_task, stop_task, models_warmup_task):
+        task.cancel()
+    await asyncio.gather(polling_task, stop_task, models_warmup_task, return_exceptions=True)
+
+    await shutdown_handler_async()
 
 
 if __name__ == "__main__":
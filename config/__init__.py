@@ -4,6 +4,7 @@ Contains all environment variables and constants.
 """
 
 import os
+import sys
 from dotenv import load_dotenv
 
 # Load environment variables from .env
@@ -14,6 +15,7 @@ load_dotenv()
 # Telegram
 TG_BOT_TOKEN = os.environ.get("TG_BOT_TOKEN")
 ADMIN_USERNAME = os.environ.get("ADMIN_USERNAME")
+ADMIN_USERNAME_LOWER = sys.intern(ADMIN_USERNAME.lower() if ADMIN_USERNAME else "")  # for case-insensitive checks
 
 
 def _require_int_env(var_name: str) -> int:
@@ -31,6 +33,12 @@ ADMIN_CHAT_ID = _require_int_env("ADMIN_CHAT_ID")
 # OpenAI-compatible API
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL")
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "100"))  # Concurrent HTTP connections to the API
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))  # Idle connections kept open
+OPENAI_CONCURRENCY = int(os.environ.get("OPENAI_CONCURRENCY", "16"))  # Max in-flight API calls; the rest wait in queue
+OPENAI_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_TIMEOUT_SECONDS", "120"))  # Read timeout (non-streamed answers arrive at once)
+OPENAI_CONNECT_TIMEOUT_SECONDS = 5.0  # Fail fast on unreachable API, retry on a fresh connection
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "2"))  # SDK retries (429/5xx/connection errors, with backoff)
 
 # S3-compatible storage
 S3_KEY_ID = os.environ.get("S3_KEY_ID")
@@ -44,18 +52,65 @@ RATE_LIMIT_REQUESTS = 10
 RATE_LIMIT_WINDOW = 60  # seconds
 API_MAX_RETRIES = 2  # Max retries for recoverable API errors
 
+# Users DB cache (in-process, revalidated against S3 ETag after TTL)
+USERS_DB_CACHE_TTL_SECONDS = int(os.environ.get("USERS_DB_CACHE_TTL_SECONDS", "30"))
+
 # Chat history limits
 MAX_HISTORY_LENGTH = int(os.environ.get("MAX_HISTORY_LENGTH", "50"))  # Maximum number of messages to keep in history
+# Messages dropped at once when history overflows: trimming in blocks keeps the
+# prompt prefix identical for several turns, so provider-side prompt caching hits
+HISTORY_TRIM_BLOCK = max(2, MAX_HISTORY_LENGTH // 5)
+# Budget for total message text in history (~4 chars per token); long answers hit it before the count limit
+HISTORY_MAX_CHARS = int(os.environ.get("HISTORY_MAX_CHARS", "100000"))
+HISTORY_CACHE_SIZE = int(os.environ.get("HISTORY_CACHE_SIZE", "1000"))  # Chats kept in memory
+HISTORY_FLUSH_DELAY_SECONDS = 2  # Debounce for writing history to S3
+HISTORY_WARMUP = os.environ.get("HISTORY_WARMUP", "false").lower() == "true"  # Preload histories on startup
+
+# User settings cache (entries are tiny, so it can hold far more chats than the history cache)
+SETTINGS_CACHE_SIZE = int(os.environ.get("SETTINGS_CACHE_SIZE", "10000"))
+# Cheap model that condenses trimmed-off history into a rolling summary (empty = just drop old messages)
+HISTORY_SUMMARY_MODEL = os.environ.get("HISTORY_SUMMARY_MODEL", "")
+HISTORY_SUMMARY_MAX_TOKENS = 500
+
+# Provider models list (/models, /model) cache
+MODELS_CACHE_TTL_SECONDS = int(os.environ.get("MODELS_CACHE_TTL_SECONDS", "600"))
 
 # Message and token limits
 MAX_MESSAGE_LENGTH = 4000  # Telegram limit is 4096, use safe margin
 MAX_VISION_TOKENS = 4000  # Max tokens for vision model responses
 
+# Send photos to the vision model as presigned S3 URLs instead of base64 data URLs.
+# Requires the S3 endpoint to be reachable from the model provider.
+VISION_IMAGE_URLS = os.environ.get("VISION_IMAGE_URLS", "false").lower() == "true"
+VISION_IMAGE_URL_TTL_SECONDS = 3600
+VISION_PHOTO_MAX_BYTES = 1024 * 1024  # Largest photo size (of those Telegram offers) to download
+
 # MCP configuration
+MCP_ENABLED = os.environ.get("MCP_ENABLED", "false").lower() == "true"
+MCP_WARMUP_CACHE = os.environ.get("MCP_WARMUP_CACHE", "true").lower() == "true"  # Fetch tools list on startup
 MCP_TOOL_TIMEOUT_SECONDS = 60  # Timeout for tool execution
 MCP_MAX_ITERATIONS = 5  # Maximum tool call iterations to prevent loops
 MCP_CACHE_TTL_SECONDS = int(os.environ.get("MCP_CACHE_TTL_SECONDS", "3600"))  # Cache TTL for tools list (default: 1 hour)
 
+# Telegram HTTP connection pool (shared aiohttp session of AsyncTeleBot)
+TELEGRAM_MAX_CONNECTIONS = int(os.environ.get("TELEGRAM_MAX_CONNECTIONS", "100"))
+
+# Telegram long polling
+POLLING_TIMEOUT_SECONDS = int(os.environ.get("POLLING_TIMEOUT_SECONDS", "50"))  # getUpdates long-poll timeout (max 50)
+POLLING_ALLOWED_UPDATES = ["message"]  # Only update types we have handlers for
+
+# Telegram webhook (used instead of polling when WEBHOOK_URL is set)
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL")  # Public HTTPS base URL, e.g. https://bot.example.com
+WEBHOOK_PATH = "/webhook"
+WEBHOOK_HOST = os.environ.get("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET")  # Checked against X-Telegram-Bot-Api-Secret-Token
+
+# Streamed replies: show the answer while it's generated (edits one message)
+STREAM_RESPONSES = os.environ.get("STREAM_RESPONSES", "false").lower() == "true"
+STREAM_EDIT_INTERVAL_SECONDS = 1.0  # Min interval between edits (Telegram rate limits)
+VOICE_SEGMENT_MIN_CHARS = 200  # Streamed voice replies: min text per spoken segment (voice message)
+
 # Typing indicator
 TYPING_INTERVAL_SECONDS = 4  # Interval for sending typing action
 
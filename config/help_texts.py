@@ -15,6 +15,7 @@ HELP_TEXTS = {
 ⚙️ *Основные команды:*
 `/models` - список AI моделей
 `/model <name>` - выбрать модель
+`/models_refresh` (или `/models refresh`) - обновить список моделей
 `/new` - очистить историю чата
 `/image <prompt>` - генерация изображения
 
@@ -25,6 +26,7 @@ HELP_TEXTS = {
 
 🔧 *MCP Tools:*
 `/tools` - список доступных инструментов
+`/tools refresh` - перечитать инструменты с MCP серверов
 `/mcp on/off` - включить/выключить инструменты
 `/mcpstatus` - статус MCP серверов""",
 
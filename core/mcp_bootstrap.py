@@ -0,0 +1,40 @@
+"""
+MCP Manager initialization (enable check, config loading, cache warmup).
+"""
+
+from config import MCP_ENABLED, MCP_WARMUP_CACHE
+from core.telegram import app_logger
+
+
+async def init_mcp():
+    """
+    Create MCP Manager and optionally warm up its tools cache.
+
+    Must be awaited inside the main event loop (MCP connections are
+    bound to the loop they are created in).
+
+    Returns:
+        MCPServerManager instance, or None if MCP is disabled or failed
+    """
+    if not MCP_ENABLED:
+        return None
+
+    try:
+        from mcp_manager import MCPServerManager, load_mcp_configs_from_json
+
+        configs = load_mcp_configs_from_json()
+        mcp_manager = MCPServerManager(configs)
+        app_logger.info(f"MCP Manager initialized with {len(configs)} server configs")
+    except Exception as e:
+        app_logger.error(f"Failed to initialize MCP Manager: {e}")
+        return None
+
+    if MCP_WARMUP_CACHE:
+        try:
+            app_logger.info("Warming up MCP tools cache...")
+            tools = await mcp_manager.get_all_tools()
+            app_logger.info(f"Cache warmed up with {len(tools)} tools")
+        except Exception as warmup_error:
+            app_logger.warning(f"Failed to warm up cache (will retry on first request): {warmup_error}")
+
+    return mcp_manager
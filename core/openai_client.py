@@ -2,11 +2,38 @@
 OpenAI client initialization.
 """
 
+import asyncio
+import httpx
 import openai
-from config import OPENAI_API_KEY, OPENAI_BASE_URL
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    OPENAI_CONCURRENCY,
+    OPENAI_TIMEOUT_SECONDS,
+    OPENAI_CONNECT_TIMEOUT_SECONDS,
+    OPENAI_MAX_RETRIES,
+)
 
-# Create OpenAI client
-client = openai.Client(
+# Create async OpenAI client (requests don't block the event loop).
+# Concurrent user turns share one keep-alive connection pool, so bursts
+# reuse open TCP/TLS connections instead of handshaking per request.
+# Short connect timeout + SDK retries: a dead connection is replaced quickly
+# instead of stalling a user for the SDK's default 10 minutes.
+client = openai.AsyncOpenAI(
     api_key=OPENAI_API_KEY,
     base_url=OPENAI_BASE_URL,
+    timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=OPENAI_CONNECT_TIMEOUT_SECONDS),
+    max_retries=OPENAI_MAX_RETRIES,
+    http_client=openai.DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+    ),
 )
+
+# Caps in-flight API calls (completions, audio, images). A burst of chats
+# queues here instead of opening hundreds of requests and hitting 429s.
+openai_sem = asyncio.Semaphore(OPENAI_CONCURRENCY)
@@ -2,25 +2,43 @@
 Telegram bot initialization and logging setup.
 """
 
+import atexit
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from telebot import asyncio_helper
 from telebot.async_telebot import AsyncTeleBot
-from config import TG_BOT_TOKEN
+from config import TG_BOT_TOKEN, TELEGRAM_MAX_CONNECTIONS
 
 # Setup telebot logger
 logger = logging.getLogger('telebot')
 logger.setLevel(logging.INFO)
 
-# Настройка логирования (только в stdout для Docker)
+# Настройка логирования (только в stdout для Docker).
+# Records are put on a queue and written by a background thread, so a slow
+# stdout (container log driver) never blocks the event loop.
+_log_queue = queue.SimpleQueue()
+_stream_handler = logging.StreamHandler()
+_stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    format='%(message)s',  # QueueHandler only merges args; the line is formatted by the listener
     handlers=[
-        logging.StreamHandler()
+        QueueHandler(_log_queue)
     ]
 )
 
+log_listener = QueueListener(_log_queue, _stream_handler)
+log_listener.start()
+atexit.register(log_listener.stop)  # drain remaining records on exit
+
 # Application logger
 app_logger = logging.getLogger(__name__)
 
+# All Bot API calls (incl. file downloads) share one keep-alive aiohttp session;
+# size its connection pool for concurrent handlers
+asyncio_helper.REQUEST_LIMIT = TELEGRAM_MAX_CONNECTIONS
+
 # Create bot instance (async version for concurrent request handling)
 bot = AsyncTeleBot(TG_BOT_TOKEN)
@@ -0,0 +1,62 @@
+"""
+Telegram webhook server (aiohttp).
+
+Used instead of long polling when WEBHOOK_URL is set: Telegram pushes
+updates to us, so there are no getUpdates round-trips between messages.
+"""
+
+import asyncio
+import hmac
+from aiohttp import web
+from telebot import types
+from config import (
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    POLLING_ALLOWED_UPDATES,
+)
+from core.telegram import bot, app_logger
+from utils.serialization import json_loads
+
+# Running update handlers (strong refs until done)
+_update_tasks = set()
+
+
+async def _handle_update(request):
+    """Accept an update from Telegram and process it in the background"""
+    if WEBHOOK_SECRET and not hmac.compare_digest(
+        request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), WEBHOOK_SECRET
+    ):
+        return web.Response(status=403)
+
+    update = types.Update.de_json(await request.json(loads=json_loads))
+
+    # Reply 200 right away: Telegram re-sends updates that aren't acknowledged
+    # in time, and AI responses can take much longer than that
+    task = asyncio.create_task(bot.process_new_updates([update]))
+    _update_tasks.add(task)
+    task.add_done_callback(_update_tasks.discard)
+    return web.Response()
+
+
+async def run_webhook():
+    """Start the webhook server, register it with Telegram and serve until cancelled"""
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, _handle_update)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+        await bot.set_webhook(
+            url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=POLLING_ALLOWED_UPDATES,
+        )
+        app_logger.info(f"Webhook server listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
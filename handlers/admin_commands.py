@@ -2,9 +2,13 @@
 Admin command handlers.
 """
 
+import asyncio
+from collections import defaultdict
 from core.telegram import bot, app_logger
 from auth.user_manager import get_users_db, set_user_status
+from models.model_manager import fetch_models, invalidate_models_cache
 from utils.decorators import require_auth, log_command, handle_errors
+from utils.messaging import get_command_args
 import ai.processor  # For accessing mcp_manager
 
 
@@ -14,7 +18,7 @@ import ai.processor  # For accessing mcp_manager
 @handle_errors()
 async def list_users(message):
     """Список всех пользователей (только для админа)"""
-    users_db = get_users_db()
+    users_db = await asyncio.to_thread(get_users_db)
     users = users_db.get("users", {})
 
     if not users:
@@ -28,20 +32,25 @@ async def list_users(message):
         "denied": "❌",
     }
 
-    text = "👥 *Список пользователей:*\n\n"
+    # Раскладываем пользователей по статусам за один проход
+    users_by_status = defaultdict(list)
+    for user in users.values():
+        users_by_status[user["status"]].append(user)
+
+    parts = ["👥 *Список пользователей:*\n\n"]
 
     for status in ["pending", "approved", "denied"]:
-        status_users = [u for u in users.values() if u["status"] == status]
+        status_users = users_by_status.get(status)
         if status_users:
-            text += f"{status_emoji[status]} *{status.title()}* ({len(status_users)}):\n"
+            parts.append(f"{status_emoji[status]} *{status.title()}* ({len(status_users)}):\n")
             for user in status_users:
                 username = user.get("username", "unknown")
                 chat_id = user.get("chat_id", "unknown")
                 first_seen = user.get("first_seen", "unknown")[:10]
-                text += f"  • `@{username}` — `{chat_id}` — {first_seen}\n"
-            text += "\n"
+                parts.append(f"  • `@{username}` — `{chat_id}` — {first_seen}\n")
+            parts.append("\n")
 
-    await bot.reply_to(message, text, parse_mode="Markdown")
+    await bot.reply_to(message, "".join(parts), parse_mode="Markdown")
 
 
 async def update_user_access(message, username_arg: str, new_status: str, command_name: str):
@@ -80,16 +89,13 @@ async def update_user_access(message, username_arg: str, new_status: str, comman
         return
 
     # Обновляем статус пользователя
-    if set_user_status(username, new_status):
+    user = await asyncio.to_thread(set_user_status, username, new_status)
+    if user:
         # Уведомляем пользователя
-        users_db = get_users_db()
-        user = users_db["users"].get(username.lower())
-        if user:
-            chat_id = user.get("chat_id")
-            try:
-                await bot.send_message(chat_id, messages["user"])
-            except Exception as e:
-                app_logger.warning(f"Failed to notify user {username}: {e}")
+        try:
+            await bot.send_message(user.get("chat_id"), messages["user"])
+        except Exception as e:
+            app_logger.warning(f"Failed to notify user {username}: {e}")
 
         # Уведомляем админа
         await bot.reply_to(message, messages["admin"])
@@ -104,7 +110,7 @@ async def update_user_access(message, username_arg: str, new_status: str, comman
 @handle_errors()
 async def approve_user(message):
     """Одобрить пользователя (только для админа)"""
-    args = message.text.split("/approve", 1)[1].strip()
+    args = get_command_args(message)
     if not args:
         await bot.reply_to(message, "Используйте: `/approve <username>`", parse_mode="Markdown")
         return
@@ -117,7 +123,7 @@ async def approve_user(message):
 @handle_errors()
 async def deny_user(message):
     """Запретить пользователя (только для админа)"""
-    args = message.text.split("/deny", 1)[1].strip()
+    args = get_command_args(message)
     if not args:
         await bot.reply_to(message, "Используйте: `/deny <username>`", parse_mode="Markdown")
         return
@@ -125,6 +131,18 @@ async def deny_user(message):
     await update_user_access(message, args, "denied", "deny")
 
 
+@bot.message_handler(commands=["models_refresh"])
+@require_auth(admin_only=True)
+@log_command
+@handle_errors()
+async def refresh_models(message):
+    """Сбросить кеш списка моделей и загрузить его заново (только для админа)"""
+    invalidate_models_cache()
+    models_by_owner = await fetch_models()
+    total = sum(len(models) for models in models_by_owner.values())
+    await bot.reply_to(message, f"🔄 Список моделей обновлён: {total} моделей.")
+
+
 @bot.message_handler(commands=["mcpstatus"])
 @require_auth(admin_only=True)
 @log_command
@@ -136,9 +154,9 @@ async def mcp_status(message):
 
     status = ai.processor.mcp_manager.get_server_status()
 
-    status_text = "🔧 *MCP Server Status:*\n\n"
+    parts = ["🔧 *MCP Server Status:*\n\n"]
     for server_name, server_status in status.items():
         emoji = "✅" if server_status == "connected" else "❌"
-        status_text += f"{emoji} *{server_name}*: `{server_status}`\n"
+        parts.append(f"{emoji} *{server_name}*: `{server_status}`\n")
 
-    await bot.reply_to(message, status_text, parse_mode="Markdown")
+    await bot.reply_to(message, "".join(parts), parse_mode="Markdown")
@@ -2,23 +2,59 @@
 User command handlers.
 """
 
+import asyncio
 from core.telegram import bot, app_logger
-from core.openai_client import client
-from auth.access_control import is_authorized
-from models.model_manager import fetch_models
-from storage.user_settings import get_user_model, set_user_model, get_user_system_prompt, set_user_system_prompt, reset_user_system_prompt
+from core.openai_client import client, openai_sem
+from auth.access_control import is_admin
+from models.model_manager import fetch_models, is_model_available, invalidate_models_cache
+from storage.user_settings import get_user_settings, get_user_model, set_user_model, get_user_system_prompt, set_user_system_prompt, reset_user_system_prompt
 from storage.chat_history import clear_chat_history
 from utils.decorators import require_auth, rate_limited, log_command, handle_errors
+from utils.messaging import get_command_args
 from config.help_texts import HELP_TEXTS
 from config import DEFAULT_SYSTEM_PROMPT
 
 
+# Rendered /models text per current model, valid while fetch_models() returns
+# the same dict (i.e. until the models cache refreshes)
+_models_text_cache = {"source": None, "texts": {}}
+_MODELS_TEXT_CACHE_MAX = 64
+
+
+def _render_models_text(models_by_owner, current_model):
+    """Текст /models (кешируется по текущей модели, пока список моделей не изменился)"""
+    if _models_text_cache["source"] is not models_by_owner:
+        _models_text_cache["source"] = models_by_owner
+        _models_text_cache["texts"] = {}
+    texts = _models_text_cache["texts"]
+
+    text = texts.get(current_model)
+    if text is not None:
+        return text
+
+    parts = ["📋 *Доступные модели:*\n\n"]
+
+    for owner, models in sorted(models_by_owner.items()):
+        parts.append(f"🏢 *{owner}*\n")
+        for model_id in sorted(models):
+            prefix = "▶️ " if model_id == current_model else "  "
+            parts.append(f"{prefix}`{model_id}`\n")
+        parts.append("\n")
+
+    parts.append(f"🔧 Текущая модель: `{current_model}`")
+    parts.append("\n\nИспользуй /model <название> для смены модели")
+
+    text = "".join(parts)
+    if len(texts) >= _MODELS_TEXT_CACHE_MAX:
+        texts.clear()
+    texts[current_model] = text
+    return text
+
+
 @bot.message_handler(commands=["help", "start"])
 @require_auth()
 async def send_welcome(message):
     # Для админа показываем расширенную справку
-    from auth.access_control import is_admin
-
     help_text = HELP_TEXTS["admin"] if is_admin(message) else HELP_TEXTS["user"]
     await bot.reply_to(message, help_text, parse_mode="Markdown")
 
@@ -28,7 +64,7 @@ async def send_welcome(message):
 @log_command
 @handle_errors("❌ Не удалось очистить историю. Попробуйте позже.")
 async def clear_history(message):
-    success = clear_chat_history(message.chat.id)
+    success = await clear_chat_history(message.chat.id)
     if success:
         await bot.reply_to(message, "✅ История чата очищена!")
     else:
@@ -40,22 +76,16 @@ async def clear_history(message):
 @log_command
 @handle_errors()
 async def list_models(message):
-    current_model = get_user_model(message.chat.id)
-    models_by_owner = fetch_models()
+    # "/models refresh" (admin): drop cached list and load it from the API again
+    if get_command_args(message).lower() == "refresh" and is_admin(message):
+        invalidate_models_cache()
 
-    models_list = "📋 *Доступные модели:*\n\n"
-
-    for owner, models in sorted(models_by_owner.items()):
-        models_list += f"🏢 *{owner}*\n"
-        for model_id in sorted(models):
-            prefix = "▶️ " if model_id == current_model else "  "
-            models_list += f"{prefix}`{model_id}`\n"
-        models_list += "\n"
-
-    models_list += f"🔧 Текущая модель: `{current_model}`"
-    models_list += "\n\nИспользуй /model <название> для смены модели"
+    current_model, models_by_owner = await asyncio.gather(
+        asyncio.to_thread(get_user_model, message.chat.id),
+        fetch_models(),
+    )
 
-    await bot.reply_to(message, models_list, parse_mode="Markdown")
+    await bot.reply_to(message, _render_models_text(models_by_owner, current_model), parse_mode="Markdown")
 
 
 @bot.message_handler(commands=["model"])
@@ -63,8 +93,8 @@ async def list_models(message):
 @log_command
 @handle_errors()
 async def set_model(message):
-    args = message.text.split("/model")[1].strip()
-    if len(args) == 0:
+    model_name = get_command_args(message)
+    if not model_name:
         await bot.reply_to(
             message,
             "Используй: /model <название>\n\nСписок моделей: /models",
@@ -72,15 +102,13 @@ async def set_model(message):
         )
         return
 
-    model_name = args.strip()
-
-    # Проверяем, существует ли модель
-    models_by_owner = fetch_models()
-    all_models = []
-    for models in models_by_owner.values():
-        all_models.extend(models)
-
-    if model_name not in all_models:
+    # Проверяем, существует ли модель; параллельно подгружаем настройки в кеш,
+    # чтобы set_user_model ниже не ждал S3 GET
+    model_available, _ = await asyncio.gather(
+        is_model_available(model_name),
+        asyncio.to_thread(get_user_settings, message.chat.id),
+    )
+    if not model_available:
         await bot.reply_to(
             message,
             f"❌ Модель `{model_name}` не найдена.\n\nСписок моделей: /models",
@@ -88,7 +116,7 @@ async def set_model(message):
         )
         return
 
-    set_user_model(message.chat.id, model_name)
+    await asyncio.to_thread(set_user_model, message.chat.id, model_name)
     await bot.reply_to(
         message,
         f"✅ Модель изменена на: `{model_name}`",
@@ -102,14 +130,15 @@ async def set_model(message):
 @log_command
 @handle_errors("Произошла ошибка, попробуйте позже!")
 async def image(message):
-    prompt = message.text.split("/image")[1].strip()
-    if len(prompt) == 0:
+    prompt = get_command_args(message)
+    if not prompt:
         await bot.reply_to(message, "Введите запрос после команды /image")
         return
 
-    response = client.images.generate(
-        prompt=prompt, n=1, size="1024x1024", model="dall-e-3"
-    )
+    async with openai_sem:
+        response = await client.images.generate(
+            prompt=prompt, n=1, size="1024x1024", model="dall-e-3"
+        )
     image_url = response.data[0].url
 
     await bot.send_photo(
@@ -125,7 +154,7 @@ async def image(message):
 @handle_errors()
 async def show_system_prompt(message):
     """Показать текущий system prompt"""
-    user_prompt = get_user_system_prompt(message.chat.id)
+    user_prompt = await asyncio.to_thread(get_user_system_prompt, message.chat.id)
 
     if user_prompt:
         response = f"🔧 *Ваш пользовательский system prompt:*\n\n```\n{user_prompt}\n```\n\n"
@@ -143,9 +172,9 @@ async def show_system_prompt(message):
 @handle_errors()
 async def set_system_prompt_command(message):
     """Установить пользовательский system prompt"""
-    args = message.text.split("/set_system_prompt", 1)
+    prompt = get_command_args(message)
 
-    if len(args) < 2 or not args[1].strip():
+    if not prompt:
         await bot.reply_to(
             message,
             "❌ Введите текст промпта после команды.\n\n"
@@ -156,8 +185,6 @@ async def set_system_prompt_command(message):
         )
         return
 
-    prompt = args[1].strip()
-
     # Ограничение длины промпта (разумное ограничение)
     if len(prompt) > 2000:
         await bot.reply_to(
@@ -168,7 +195,7 @@ async def set_system_prompt_command(message):
         )
         return
 
-    set_user_system_prompt(message.chat.id, prompt)
+    await asyncio.to_thread(set_user_system_prompt, message.chat.id, prompt)
 
     response = f"✅ System prompt установлен!\n\n*Ваш промпт:*\n```\n{prompt}\n```\n\n"
     response += "Используйте /system_prompt для просмотра\n"
@@ -183,7 +210,7 @@ async def set_system_prompt_command(message):
 @handle_errors()
 async def reset_system_prompt_command(message):
     """Сбросить system prompt к дефолтному"""
-    was_reset = reset_user_system_prompt(message.chat.id)
+    was_reset = await asyncio.to_thread(reset_user_system_prompt, message.chat.id)
 
     if was_reset:
         response = f"✅ System prompt сброшен к дефолтному!\n\n"
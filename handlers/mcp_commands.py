@@ -2,9 +2,12 @@
 MCP (Model Context Protocol) command handlers.
 """
 
+import asyncio
 from core.telegram import bot, app_logger
 from storage.user_settings import should_use_mcp_for_user, set_mcp_for_user
 from utils.decorators import require_auth, log_command, handle_errors
+from utils.messaging import get_command_args
+from auth.access_control import is_admin
 import ai.processor  # For accessing mcp_manager
 
 
@@ -17,6 +20,10 @@ async def list_tools(message):
         await bot.reply_to(message, "🔧 MCP tools are not enabled.")
         return
 
+    # "/tools refresh" (admin): reload tools from MCP servers
+    if get_command_args(message).lower() == "refresh" and is_admin(message):
+        ai.processor.mcp_manager.invalidate_cache()
+
     tools = await ai.processor.mcp_manager.get_all_tools()
 
     if not tools:
@@ -24,7 +31,7 @@ async def list_tools(message):
         return
 
     # Format tool list grouped by server
-    tools_text = "🔧 *Available MCP Tools:*\n\n"
+    header = "🔧 *Available MCP Tools:*\n\n"
 
     tools_by_server = {}
     for tool in tools:
@@ -33,41 +40,45 @@ async def list_tools(message):
             tools_by_server[server_name] = []
         tools_by_server[server_name].append(tool["function"])
 
+    # One section per server, built once and reused for single/split output
+    server_sections = []
     for server, server_tools in sorted(tools_by_server.items()):
-        tools_text += f"📦 *{server}* ({len(server_tools)} tools)\n"
-        for tool_func in server_tools:
-            name = tool_func["name"]
-            # Just show tool name, no description (to keep message short)
-            tools_text += f"  - `{name}`\n"
-        tools_text += "\n"
-
-    mcp_status = "✅ enabled" if should_use_mcp_for_user(message.chat.id) else "❌ disabled"
-    tools_text += f"💡 MCP tools for you: {mcp_status}\n"
-    tools_text += "Use `/mcp on` or `/mcp off` to toggle.\n"
-    tools_text += f"\nTotal: {len(tools)} tools available."
+        # Just show tool names, no description (to keep message short)
+        lines = [f"📦 *{server}* ({len(server_tools)} tools)\n"]
+        lines.extend(f"  - `{tool_func['name']}`\n" for tool_func in server_tools)
+        lines.append("\n")
+        server_sections.append("".join(lines))
+
+    mcp_enabled = await asyncio.to_thread(should_use_mcp_for_user, message.chat.id)
+    mcp_status = "✅ enabled" if mcp_enabled else "❌ disabled"
+    tools_text = "".join([
+        header,
+        *server_sections,
+        f"💡 MCP tools for you: {mcp_status}\n",
+        "Use `/mcp on` or `/mcp off` to toggle.\n",
+        f"\nTotal: {len(tools)} tools available.",
+    ])
 
     # Check if message is too long (Telegram limit is 4096 chars)
     if len(tools_text) > 4000:
         # Split into multiple messages
         messages = []
-        current_msg = "🔧 *Available MCP Tools:*\n\n"
-
-        for server, server_tools in sorted(tools_by_server.items()):
-            server_section = f"📦 *{server}* ({len(server_tools)} tools)\n"
-            for tool_func in server_tools:
-                server_section += f"  - `{tool_func['name']}`\n"
-            server_section += "\n"
+        current_parts = [header]
+        current_len = len(header)
 
-            if len(current_msg) + len(server_section) > 3500:
-                messages.append(current_msg)
-                current_msg = ""
+        for server_section in server_sections:
+            if current_len + len(server_section) > 3500:
+                messages.append("".join(current_parts))
+                current_parts = []
+                current_len = 0
 
-            current_msg += server_section
+            current_parts.append(server_section)
+            current_len += len(server_section)
 
-        if current_msg:
-            current_msg += f"\n💡 MCP tools: {mcp_status}\n"
-            current_msg += f"Total: {len(tools)} tools"
-            messages.append(current_msg)
+        if current_parts:
+            current_parts.append(f"\n💡 MCP tools: {mcp_status}\n")
+            current_parts.append(f"Total: {len(tools)} tools")
+            messages.append("".join(current_parts))
 
         # Send multiple messages
         for msg in messages:
@@ -84,16 +95,17 @@ async def toggle_mcp(message):
         await bot.reply_to(message, "🔧 MCP tools are not available.")
         return
 
-    args = message.text.split("/mcp")[1].strip().lower()
+    args = get_command_args(message).lower()
 
     if args == "on":
-        set_mcp_for_user(message.chat.id, True)
+        await asyncio.to_thread(set_mcp_for_user, message.chat.id, True)
         await bot.reply_to(message, "✅ MCP tools enabled.")
     elif args == "off":
-        set_mcp_for_user(message.chat.id, False)
+        await asyncio.to_thread(set_mcp_for_user, message.chat.id, False)
         await bot.reply_to(message, "❌ MCP tools disabled.")
     else:
-        current_status = "enabled" if should_use_mcp_for_user(message.chat.id) else "disabled"
+        mcp_enabled = await asyncio.to_thread(should_use_mcp_for_user, message.chat.id)
+        current_status = "enabled" if mcp_enabled else "disabled"
         await bot.reply_to(
             message,
             f"🔧 *MCP Tools:* {current_status}\n\n"
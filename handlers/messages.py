@@ -2,12 +2,26 @@
 Text and photo message handlers.
 """
 
+import asyncio
 from core.telegram import bot, app_logger
 from auth.access_control import is_authorized, is_admin, should_process_message
 from utils.rate_limiter import check_rate_limit
 from utils.typing_indicator import start_typing, stop_typing
-from utils.messaging import send_long_message
+from utils.messaging import send_long_message, download_telegram_file, StreamingReply
 from ai.processor import process_text_message
+from storage.chat_history import get_chat_history
+from config import STREAM_RESPONSES, VISION_PHOTO_MAX_BYTES
+
+
+def _pick_photo_size(sizes):
+    """
+    Выбрать размер фото для vision-модели: самый большой, что укладывается
+    в VISION_PHOTO_MAX_BYTES (sizes отсортированы по возрастанию).
+    """
+    for size in reversed(sizes):
+        if size.file_size and size.file_size <= VISION_PHOTO_MAX_BYTES:
+            return size
+    return sizes[0]
 
 
 @bot.message_handler(func=should_process_message, content_types=["text", "photo"])
@@ -28,6 +42,7 @@ async def echo_message(message):
             return
 
     await start_typing(message.chat.id)
+    streaming_reply = StreamingReply(message) if STREAM_RESPONSES else None
 
     try:
         text = message.text
@@ -37,27 +52,39 @@ async def echo_message(message):
         photo = message.photo
         if photo is not None:
             has_photo = True
-            photo = photo[0]
-            file_info = await bot.get_file(photo.file_id)
-            image_content = await bot.download_file(file_info.file_path)
+            photo = _pick_photo_size(photo)
+            # Download photo while chat history is loaded into cache
+            image_content, _ = await asyncio.gather(
+                download_telegram_file(photo.file_id),
+                get_chat_history(message.chat.id),
+            )
             text = message.caption
             if text is None or len(text) == 0:
                 text = "Что на картинке?"
 
-        ai_response = await process_text_message(text, message.chat.id, image_content)
+        ai_response = await process_text_message(
+            text, message.chat.id, image_content,
+            on_partial=streaming_reply.update if streaming_reply else None,
+        )
 
-        log_msg_type = "photo" if has_photo else "text"
         app_logger.info(
-            f"Message processed: user={message.from_user.username}, chat_id={message.chat.id}, "
-            f"type={log_msg_type}, prompt_length={len(text) if text else 0}, "
-            f"response_length={len(ai_response) if ai_response else 0}"
+            "Message processed: user=%s, chat_id=%s, type=%s, prompt_length=%d, response_length=%d",
+            message.from_user.username, message.chat.id, "photo" if has_photo else "text",
+            len(text) if text else 0, len(ai_response) if ai_response else 0
         )
     except Exception as e:
         app_logger.error(f"Error processing message: user={message.from_user.username}, chat_id={message.chat.id}, error={str(e)}")
+        if streaming_reply:
+            # Let a draft edit in flight land before the error reply
+            await streaming_reply.close()
         await bot.reply_to(message, f"Произошла ошибка, попробуйте позже! {e}")
         return
-
-    await stop_typing(message.chat.id)
+    finally:
+        # Always stop typing, even on errors (otherwise the loop runs forever)
+        await stop_typing(message.chat.id)
 
     # Send with automatic splitting and parse error recovery
-    await send_long_message(message.chat.id, ai_response, reply_to_message=message, parse_mode="HTML")
+    if streaming_reply:
+        await streaming_reply.finish(ai_response)
+    else:
+        await send_long_message(message.chat.id, ai_response, reply_to_message=message, parse_mode="HTML")
@@ -2,15 +2,22 @@
 Voice message handler.
 """
 
-import os
-import uuid
-import tempfile
+import io
+import re
+import asyncio
 from telebot.types import InputFile
 from core.telegram import bot, app_logger
-from core.openai_client import client
+from core.openai_client import client, openai_sem
 from auth.access_control import is_authorized, is_admin, should_process_message
 from utils.rate_limiter import check_rate_limit
+from utils.typing_indicator import start_typing, stop_typing
+from utils.messaging import download_telegram_file
+from storage.chat_history import get_chat_history
 from ai.processor import process_text_message
+from config import STREAM_RESPONSES, VOICE_SEGMENT_MIN_CHARS
+
+# End of a sentence (punctuation followed by whitespace) or a line break
+_SENTENCE_END_RE = re.compile(r'[.!?…]+["»)]*\s+|\n+')
 
 
 @bot.message_handler(
@@ -32,47 +39,128 @@ async def voice(message):
             app_logger.warning(f"Rate limit hit (voice): user={message.from_user.username}, chat_id={message.chat.id}")
             return
 
-    app_logger.info(f"Voice message received: user={message.from_user.username}, chat_id={message.chat.id}")
+    app_logger.info("Voice message received: user=%s, chat_id=%s", message.from_user.username, message.chat.id)
 
-    file_info = await bot.get_file(message.voice.file_id)
-    downloaded_file = await bot.download_file(file_info.file_path)
+    # Show "recording voice" while the STT -> AI -> TTS pipeline runs
+    await start_typing(message.chat.id, action="record_voice")
 
-    # Create unique temporary file to avoid race conditions
-    temp_file = None
     try:
-        response = client.audio.transcriptions.create(
-            file=("file.ogg", downloaded_file, "audio/ogg"),
-            model="whisper-1",
+        # Download voice while chat history is loaded into cache
+        downloaded_file, _ = await asyncio.gather(
+            download_telegram_file(message.voice.file_id),
+            get_chat_history(message.chat.id),
         )
+
+        async with openai_sem:
+            response = await client.audio.transcriptions.create(
+                file=("file.ogg", downloaded_file, "audio/ogg"),
+                model="whisper-1",
+            )
         transcribed_text = response.text
-        app_logger.info(f"Voice transcribed: user={message.from_user.username}, chat_id={message.chat.id}, text='{transcribed_text[:100]}...'")
-
-        ai_response = await process_text_message(transcribed_text, message.chat.id)
-        ai_voice_response = client.audio.speech.create(
-            input=ai_response,
-            voice="nova",
-            model="tts-1-hd",
-            response_format="opus",
+        app_logger.info(
+            "Voice transcribed: user=%s, chat_id=%s, text='%.100s...'",
+            message.from_user.username, message.chat.id, transcribed_text
         )
 
-        # Use unique filename to avoid race conditions between different users
-        temp_file = os.path.join(tempfile.gettempdir(), f"ai_voice_{message.chat.id}_{uuid.uuid4().hex}.ogg")
-        with open(temp_file, "wb") as f:
-            f.write(ai_voice_response.content)
-
-        with open(temp_file, "rb") as f:
+        if STREAM_RESPONSES:
+            # Speak the answer segment by segment while it's being generated
+            voice_reply = _StreamingVoiceReply(message)
+            try:
+                ai_response = await process_text_message(
+                    transcribed_text, message.chat.id, on_partial=voice_reply.update
+                )
+                await voice_reply.finish(ai_response)
+            except BaseException:
+                # No voice messages after the error reply, no orphaned tasks
+                await voice_reply.cancel()
+                raise
+        else:
+            ai_response = await process_text_message(transcribed_text, message.chat.id)
             await bot.send_voice(
                 message.chat.id,
-                voice=InputFile(f),
+                voice=InputFile(await _synthesize_voice(ai_response)),
                 reply_to_message_id=message.message_id,
             )
     except Exception as e:
         app_logger.error(f"Voice processing failed: user={message.from_user.username}, chat_id={message.chat.id}, error={str(e)}")
         await bot.reply_to(message, f"Произошла ошибка, попробуйте позже! {e}")
     finally:
-        # Clean up temporary file
-        if temp_file and os.path.exists(temp_file):
-            try:
-                os.remove(temp_file)
-            except Exception as e:
-                app_logger.warning(f"Failed to remove temp file {temp_file}: {e}")
+        await stop_typing(message.chat.id)
+
+
+async def _synthesize_voice(text):
+    """Text-to-speech into an in-memory OGG/Opus buffer (no temp file on disk)"""
+    voice_buffer = io.BytesIO()
+    async with openai_sem, client.audio.speech.with_streaming_response.create(
+        input=text,
+        voice="nova",
+        model="tts-1-hd",
+        response_format="opus",
+    ) as ai_voice_response:
+        async for chunk in ai_voice_response.iter_bytes():
+            voice_buffer.write(chunk)
+    voice_buffer.name = "voice.ogg"
+    voice_buffer.seek(0)
+    return voice_buffer
+
+
+class _StreamingVoiceReply:
+    """
+    Voice reply pipelined with answer generation.
+
+    Complete sentences (at least VOICE_SEGMENT_MIN_CHARS) are synthesized as
+    soon as they are generated, concurrently with the rest of the answer;
+    the resulting voice messages are sent in order. Time to first audio is
+    the first segment's TTS instead of the whole answer's.
+    """
+
+    def __init__(self, message):
+        self.message = message
+        self.spoken_text = ""  # answer prefix already handed to TTS
+        self.last_send = None  # task sending the latest segment
+        self.tasks = []  # all TTS and send tasks, for cancel()
+
+    def update(self, text):
+        """Partial answer from the stream: speak complete sentences (TTS runs in tasks)"""
+        if not text.startswith(self.spoken_text):
+            return
+        end = None
+        for match in _SENTENCE_END_RE.finditer(text, len(self.spoken_text)):
+            end = match.end()
+        if end is not None and end - len(self.spoken_text) >= VOICE_SEGMENT_MIN_CHARS:
+            self._speak(text[len(self.spoken_text):end])
+            self.spoken_text = text[:end]
+
+    async def finish(self, text):
+        """Speak the rest of the final answer and wait until everything is sent"""
+        # Final answer may differ from the stream (e.g. after tool calls): speak all of it
+        rest = text[len(self.spoken_text):] if text.startswith(self.spoken_text) else text
+        if rest.strip():
+            self._speak(rest)
+        if self.last_send is not None:
+            await self.last_send
+
+    async def cancel(self):
+        """Stop speaking: cancel pending TTS and sends (e.g. when the answer failed)"""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def _speak(self, segment):
+        tts_task = asyncio.create_task(_synthesize_voice(segment))
+        self.last_send = asyncio.create_task(self._send_in_order(tts_task, self.last_send))
+        self.tasks += (tts_task, self.last_send)
+
+    async def _send_in_order(self, tts_task, previous_send):
+        try:
+            if previous_send is not None:
+                await previous_send
+        except BaseException:
+            tts_task.cancel()
+            raise
+        await bot.send_voice(
+            self.message.chat.id,
+            voice=InputFile(await tts_task),
+            # Only the first voice message is a reply, the rest follow it
+            reply_to_message_id=self.message.message_id if previous_send is None else None,
+        )
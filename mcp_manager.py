@@ -11,6 +11,8 @@ from typing import Dict, List, Optional, Any
 from contextlib import asynccontextmanager
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from utils.serialization import json_dumps
+from utils.coalesce import coalesce
 
 # Configure MCP logger (stdout only for Docker)
 # Note: logging.basicConfig() in core.telegram already configures root logger
@@ -125,9 +127,11 @@ class MCPServerManager:
         self._tool_cache = {}  # {tool_name: server_name}
         self._tools_list_cache = []  # Cached list of OpenAI-formatted tools
         self._cache_timestamp = 0
+        self._refresh_lock = asyncio.Lock()  # single-flight tools list refresh
 
         # Per-server persistent connections
         self._connections: Dict[str, _ServerConnection] = {}
+        self._connected_servers = set()  # names of servers connected at least once
 
         # Use provided TTL or default from environment/config
         if cache_ttl is None:
@@ -154,14 +158,24 @@ class MCPServerManager:
         if conn and not conn._stopped:
             return conn
 
+        # Parallel tool calls to one server must not spawn several server processes
+        return await coalesce(("mcp_connect", config.name), lambda: self._connect(config))
+
+    async def _connect(self, config: MCPServerConfig) -> _ServerConnection:
+        """Start a new connection to the server, replacing a stale one."""
         # Remove stale entry if present
         if config.name in self._connections:
             del self._connections[config.name]
 
+        # Reconnect: the server process is restarted and its tool set may have changed
+        if config.name in self._connected_servers:
+            self.invalidate_cache()
+
         mcp_logger.info(f"Connecting to {config.name}...")
         conn = _ServerConnection(config)
         await conn.start()
         self._connections[config.name] = conn
+        self._connected_servers.add(config.name)
         return conn
 
     async def _close_connection(self, server_name: str):
@@ -201,44 +215,69 @@ class MCPServerManager:
 
     async def get_all_tools(self) -> List[Dict]:
         """Get tools from all configured servers and update cache"""
-        import time
-
         if self._is_cache_valid() and self._tools_list_cache:
-            mcp_logger.info(f"Using cached tools: {len(self._tools_list_cache)} tools")
+            mcp_logger.debug(f"Using cached tools: {len(self._tools_list_cache)} tools")
             return self._tools_list_cache
 
-        all_tools = []
-        mcp_logger.info("Fetching fresh tools from all servers...")
+        # Concurrent requests on a cold cache share a single refresh
+        async with self._refresh_lock:
+            if self._is_cache_valid() and self._tools_list_cache:
+                return self._tools_list_cache
+            return await self._refresh_tools()
 
-        for config in self.configs:
-            try:
-                conn = await self._get_or_create_connection(config)
-                tools_result = await conn.call("list_tools")
+    def invalidate_cache(self):
+        """
+        Mark cached tools list stale so the next get_all_tools() refetches it.
 
-                for tool in tools_result.tools:
-                    openai_tool = {
-                        "type": "function",
-                        "function": {
-                            "name": tool.name,
-                            "description": tool.description or "No description available",
-                            "parameters": tool.inputSchema if hasattr(tool, "inputSchema") else {},
-                        },
-                        "_mcp_server": config.name,
-                    }
-                    all_tools.append(openai_tool)
-                    self._tool_cache[tool.name] = config.name
-
-                mcp_logger.info(f"Got {len(tools_result.tools)} tools from {config.name}")
+        Called on reconnect to a server and by "/tools refresh" (admin).
+        The tool -> server map is kept (it's rebuilt by the refetch), so a
+        refresh already in progress isn't left with a half-empty map.
+        """
+        self._cache_timestamp = 0
 
-            except Exception as e:
-                mcp_logger.error(f"Failed to get tools from {config.name}: {e}")
-                await self._close_connection(config.name)
+    async def _refresh_tools(self) -> List[Dict]:
+        """Fetch tools from all servers and store them in cache"""
+        import time
+
+        mcp_logger.info("Fetching fresh tools from all servers...")
+
+        # Query all servers concurrently (each has its own connection task)
+        per_server = await asyncio.gather(
+            *[self._fetch_server_tools(config) for config in self.configs]
+        )
+        all_tools = [tool for server_tools in per_server for tool in server_tools]
 
         self._cache_timestamp = time.time()
         self._tools_list_cache = all_tools
         mcp_logger.info(f"Tool cache updated with {len(self._tool_cache)} tools")
         return all_tools
 
+    async def _fetch_server_tools(self, config: MCPServerConfig) -> List[Dict]:
+        """Get OpenAI-formatted tools from a single server ([] on failure)"""
+        try:
+            conn = await self._get_or_create_connection(config)
+            tools_result = await conn.call("list_tools")
+        except Exception as e:
+            mcp_logger.error(f"Failed to get tools from {config.name}: {e}")
+            await self._close_connection(config.name)
+            return []
+
+        server_tools = []
+        for tool in tools_result.tools:
+            server_tools.append({
+                "type": "function",
+                "function": {
+                    "name": tool.name,
+                    "description": tool.description or "No description available",
+                    "parameters": tool.inputSchema if hasattr(tool, "inputSchema") else {},
+                },
+                "_mcp_server": config.name,
+            })
+            self._tool_cache[tool.name] = config.name
+
+        mcp_logger.info(f"Got {len(tools_result.tools)} tools from {config.name}")
+        return server_tools
+
     def _is_cache_valid(self) -> bool:
         import time
         if not self._tool_cache:
@@ -264,7 +303,7 @@ class MCPServerManager:
             return None
 
         server_name = self._tool_cache[tool_name]
-        mcp_logger.info(f"Using cached server '{server_name}' for tool '{tool_name}'")
+        mcp_logger.info("Using cached server '%s' for tool '%s'", server_name, tool_name)
 
         config = next((c for c in self.configs if c.name == server_name), None)
         if config is None:
@@ -273,7 +312,7 @@ class MCPServerManager:
         return config
 
     async def _find_server_with_tool(self, tool_name: str) -> Optional[MCPServerConfig]:
-        mcp_logger.info(f"Cache miss for tool '{tool_name}', searching all servers")
+        mcp_logger.info("Cache miss for tool '%s', searching all servers", tool_name)
 
         for config in self.configs:
             try:
@@ -301,23 +340,25 @@ class MCPServerManager:
         try:
             conn = await self._get_or_create_connection(config)
 
-            mcp_logger.info(
-                f"Executing {tool_name} on {config.name}, "
-                f"args={json.dumps(arguments, ensure_ascii=False)[:200]}"
-            )
+            if mcp_logger.isEnabledFor(logging.INFO):
+                mcp_logger.info(
+                    "Executing %s on %s, args=%.200s", tool_name, config.name, json_dumps(arguments)
+                )
 
             result = await asyncio.wait_for(
                 conn.call("call_tool", tool_name, arguments),
                 timeout=MCP_TOOL_TIMEOUT_SECONDS,
             )
 
+            content = self._extract_result_content(result)
+
             duration = time.time() - start_time
             mcp_logger.info(
-                f"Tool executed: {tool_name}, duration={duration:.2f}s, "
-                f"result_size={len(str(result))} chars"
+                "Tool executed: %s, duration=%.2fs, result_size=%d chars",
+                tool_name, duration, len(content)
             )
 
-            return self._extract_result_content(result)
+            return content
 
         except asyncio.TimeoutError:
             error_msg = f"Tool '{tool_name}' execution timed out after {MCP_TOOL_TIMEOUT_SECONDS} seconds"
@@ -2,41 +2,90 @@
 Model management (fetching available models from API).
 """
 
-import requests
+import asyncio
+import time
 from collections import defaultdict
-from config import OPENAI_BASE_URL, OPENAI_API_KEY
+from openai import APIError
+from config import MODELS_CACHE_TTL_SECONDS
+from core.openai_client import client
+from core.telegram import app_logger
 
+# Fallback list when the models endpoint is unavailable
+_DEFAULT_MODELS = {
+    "z.ai": ["glm-4.7"],
+    "qwen": ["qwen3-coder-plus"],
+    "openai": ["gpt-5.2"],
+}
+_DEFAULT_MODEL_IDS = frozenset(model_id for models in _DEFAULT_MODELS.values() for model_id in models)
 
-def fetch_models():
-    """Получить список моделей из API и сгруппировать по производителю"""
-    try:
-        models_url = f"{OPENAI_BASE_URL.rstrip('/')}/models"
-        headers = {}
-        if OPENAI_API_KEY:
-            headers["Authorization"] = f"Bearer {OPENAI_API_KEY}"
+# In-process models cache: {"data": {owner: [ids]}, "ids": frozenset, "expires": monotonic time}
+_models_cache = {"data": None, "ids": frozenset(), "expires": 0.0}
+_models_lock = asyncio.Lock()
+# After a failed refresh, keep serving the stale list this long before retrying
+_MODELS_RETRY_SECONDS = 60
 
-        response = requests.get(
-            models_url,
-            headers=headers,
-            timeout=5
+
+async def _load_models():
+    """
+    Запросить список моделей из API и сгруппировать по производителю.
+
+    Идёт через общий OpenAI клиент: тот же хост и пул keep-alive соединений,
+    что и у запросов к моделям, без отдельного TCP/TLS handshake.
+    """
+    page = await client.with_options(timeout=5, max_retries=1).models.list()
+
+    # Группируем модели по owned_by
+    models_by_owner = defaultdict(list)
+    for model in page.data:
+        owner = getattr(model, "owned_by", None) or "unknown"
+        if model.id:
+            models_by_owner[owner].append(model.id)
+
+    return dict(models_by_owner)
+
+
+async def fetch_models():
+    """
+    Получить список моделей, сгруппированный по производителю.
+
+    Результат кешируется на MODELS_CACHE_TTL_SECONDS; одновременные
+    запросы при пустом кеше делают один HTTP запрос к API. Если API
+    недоступно, отдаётся устаревший список (или дефолтный, если его нет).
+    """
+    if _models_cache["data"] is not None and time.monotonic() < _models_cache["expires"]:
+        return _models_cache["data"]
+
+    async with _models_lock:
+        # Another coroutine may have refreshed the cache while we waited
+        if _models_cache["data"] is not None and time.monotonic() < _models_cache["expires"]:
+            return _models_cache["data"]
+
+        try:
+            models_by_owner = await _load_models()
+        except APIError as e:
+            if _models_cache["data"] is not None:
+                app_logger.warning("Error fetching models, using stale list: %s", e)
+                _models_cache["expires"] = time.monotonic() + _MODELS_RETRY_SECONDS
+                return _models_cache["data"]
+            app_logger.warning("Error fetching models, using defaults: %s", e)
+            # Возврат к дефолтному списку при ошибке (не кешируем, попробуем снова)
+            return _DEFAULT_MODELS
+
+        _models_cache["data"] = models_by_owner
+        _models_cache["ids"] = frozenset(
+            model_id for models in models_by_owner.values() for model_id in models
         )
-        response.raise_for_status()
-        data = response.json()
-
-        # Группируем модели по owned_by
-        models_by_owner = defaultdict(list)
-        for model in data.get("data", []):
-            owner = model.get("owned_by", "unknown")
-            model_id = model.get("id", "")
-            if model_id:
-                models_by_owner[owner].append(model_id)
-
-        return dict(models_by_owner)
-    except Exception as e:
-        print(f"Error fetching models: {e}")
-        # Возврат к дефолтному списку при ошибке
-        return {
-            "z.ai": ["glm-4.7"],
-            "qwen": ["qwen3-coder-plus"],
-            "openai": ["gpt-5.2"],
-        }
+        _models_cache["expires"] = time.monotonic() + MODELS_CACHE_TTL_SECONDS
+        return models_by_owner
+
+
+async def is_model_available(model_name):
+    """Проверить, есть ли модель в списке доступных (O(1) по кешированному set)"""
+    models_by_owner = await fetch_models()
+    model_ids = _DEFAULT_MODEL_IDS if models_by_owner is _DEFAULT_MODELS else _models_cache["ids"]
+    return model_name in model_ids
+
+
+def invalidate_models_cache():
+    """Сбросить кеш списка моделей (следующий запрос пойдёт в API)"""
+    _models_cache["expires"] = 0.0
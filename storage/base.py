@@ -5,15 +5,21 @@ Provides a generic repository pattern to centralize S3 operations
 and reduce duplication across storage modules.
 """
 
-import json
-from typing import TypeVar, Generic, Callable, Any, Optional
+import gzip
+import os
+import re
+from typing import TypeVar, Generic, Callable, Any, Optional, Tuple, List
+from botocore.exceptions import ClientError
 from config import S3_BUCKET
 from storage.s3_client import get_s3_client
 from core.telegram import app_logger
+from utils.serialization import json_loads, json_dumpb
 
 
 T = TypeVar('T')
 
+_GZIP_MAGIC = b"\x1f\x8b"
+
 
 class S3Repository(Generic[T]):
     """
@@ -22,6 +28,9 @@ class S3Repository(Generic[T]):
     Args:
         key_pattern: S3 key pattern with {id} placeholder (e.g., "{id}.json")
         default_factory: Factory function for default value (e.g., dict, list)
+        compress: Store objects gzip-compressed
+        legacy_key_pattern: Key pattern to read from if the object is missing
+            under key_pattern (e.g., before compression was enabled)
 
     Example:
         >>> chat_repo = S3Repository("{id}.json", default_factory=list)
@@ -32,7 +41,9 @@ class S3Repository(Generic[T]):
     def __init__(
         self,
         key_pattern: str,
-        default_factory: Callable[[], T] = dict
+        default_factory: Callable[[], T] = dict,
+        compress: bool = False,
+        legacy_key_pattern: Optional[str] = None
     ):
         """
         Initialize S3 repository.
@@ -40,15 +51,45 @@ class S3Repository(Generic[T]):
         Args:
             key_pattern: S3 key pattern with {id} placeholder
             default_factory: Callable that returns default value
+            compress: Store objects gzip-compressed
+            legacy_key_pattern: Fallback key pattern for reads (optional)
         """
         self.key_pattern = key_pattern
         self.default_factory = default_factory
+        self.compress = compress
+        self.legacy_key_pattern = legacy_key_pattern
         self.s3_client = get_s3_client()
 
     def _get_key(self, id: str) -> str:
         """Generate S3 key from ID."""
         return self.key_pattern.format(id=id)
 
+    def _encode(self, data: T) -> bytes:
+        """Serialize object to JSON bytes (gzip-compressed if enabled)."""
+        body = json_dumpb(data)
+        if self.compress:
+            body = gzip.compress(body, compresslevel=6)
+        return body
+
+    @staticmethod
+    def _decode(body: bytes) -> T:
+        """Parse object from JSON bytes, plain or gzip-compressed."""
+        if body[:2] == _GZIP_MAGIC:
+            body = gzip.decompress(body)
+        return json_loads(body)
+
+    def _get_legacy(self, id: str) -> T:
+        """Read object from the legacy key, or return default."""
+        if self.legacy_key_pattern is None:
+            return self.default_factory()
+        try:
+            response = self.s3_client.get_object(
+                Bucket=S3_BUCKET, Key=self.legacy_key_pattern.format(id=id)
+            )
+            return self._decode(response["Body"].read())
+        except self.s3_client.exceptions.NoSuchKey:
+            return self.default_factory()
+
     def get(self, id: str) -> T:
         """
         Get object from S3 or return default.
@@ -65,15 +106,46 @@ class S3Repository(Generic[T]):
         key = self._get_key(id)
         try:
             response = self.s3_client.get_object(Bucket=S3_BUCKET, Key=key)
-            return json.loads(response["Body"].read())
+            return self._decode(response["Body"].read())
         except self.s3_client.exceptions.NoSuchKey:
-            return self.default_factory()
+            return self._get_legacy(id)
         except Exception as exc:
             app_logger.error(
                 f"Failed to get {key}: bucket={S3_BUCKET}, error={exc}"
             )
             raise
 
+    def get_if_changed(self, id: str, etag: Optional[str] = None) -> Tuple[Optional[T], Optional[str]]:
+        """
+        Get object from S3 only if it changed since `etag` (conditional GET).
+
+        Args:
+            id: Object identifier
+            etag: ETag of the locally cached copy (None forces a full GET)
+
+        Returns:
+            Tuple (data, etag). data is None if the object is not modified.
+
+        Raises:
+            Exception: If S3 operation fails (except NoSuchKey / NotModified)
+        """
+        key = self._get_key(id)
+        kwargs = {"Bucket": S3_BUCKET, "Key": key}
+        if etag:
+            kwargs["IfNoneMatch"] = etag
+        try:
+            response = self.s3_client.get_object(**kwargs)
+            return self._decode(response["Body"].read()), response.get("ETag")
+        except self.s3_client.exceptions.NoSuchKey:
+            return self.default_factory(), None
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") in ("304", "NotModified"):
+                return None, etag
+            app_logger.error(
+                f"Failed to get {key}: bucket={S3_BUCKET}, error={exc}"
+            )
+            raise
+
     def save(self, id: str, data: T) -> bool:
         """
         Save object to S3.
@@ -90,7 +162,7 @@ class S3Repository(Generic[T]):
             self.s3_client.put_object(
                 Bucket=S3_BUCKET,
                 Key=key,
-                Body=json.dumps(data)
+                Body=self._encode(data)
             )
             return True
         except Exception as exc:
@@ -119,6 +191,51 @@ class S3Repository(Generic[T]):
             )
             return False
 
+    def list_recent_ids(self, id_pattern: str = r"-?\d+", limit: Optional[int] = None) -> List[str]:
+        """
+        List IDs of stored objects, most recently modified first.
+
+        Objects stored only under legacy_key_pattern are included too
+        (reads fall back to them).
+
+        Args:
+            id_pattern: Regex the {id} part of the key must fully match
+            limit: Maximum number of IDs to return (None for all)
+
+        Returns:
+            List of object identifiers
+        """
+        patterns = [self.key_pattern]
+        if self.legacy_key_pattern is not None:
+            patterns.append(self.legacy_key_pattern)
+        key_res = []
+        for pattern in patterns:
+            pattern_prefix, pattern_suffix = pattern.split("{id}", 1)
+            key_res.append(re.compile(re.escape(pattern_prefix) + f"({id_pattern})" + re.escape(pattern_suffix)))
+        # One listing covers all patterns
+        prefix = os.path.commonprefix([pattern.split("{id}", 1)[0] for pattern in patterns])
+
+        list_kwargs = {"Bucket": S3_BUCKET, "Prefix": prefix}
+        if not any("/" in pattern[len(prefix):] for pattern in patterns):
+            # Our keys have no further "/": don't descend into other "folders"
+            # (e.g. images/) sharing the bucket
+            list_kwargs["Delimiter"] = "/"
+
+        last_modified = {}  # {id: most recent LastModified of its objects}
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(**list_kwargs):
+            for obj in page.get("Contents", []):
+                for key_re in key_res:
+                    match = key_re.fullmatch(obj["Key"])
+                    if match:
+                        id = match.group(1)
+                        if id not in last_modified or obj["LastModified"] > last_modified[id]:
+                            last_modified[id] = obj["LastModified"]
+                        break
+
+        ids = sorted(last_modified, key=last_modified.get, reverse=True)
+        return ids[:limit] if limit is not None else ids
+
     def exists(self, id: str) -> bool:
         """
         Check if object exists in S3.
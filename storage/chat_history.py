@@ -1,24 +1,236 @@
 """
 Chat history storage operations.
+
+History is served from an in-process LRU cache; writes update the cache
+immediately and are flushed to S3 in the background (debounced), so a
+burst of messages in one chat results in a single PUT.
 """
 
+import asyncio
+from collections import OrderedDict, deque
+from config import (
+    MAX_HISTORY_LENGTH,
+    HISTORY_TRIM_BLOCK,
+    HISTORY_MAX_CHARS,
+    HISTORY_CACHE_SIZE,
+    HISTORY_FLUSH_DELAY_SECONDS,
+)
+from core.telegram import app_logger
 from storage.base import S3Repository
+from utils.coalesce import coalesce
+
+
+# Chat history repository: stores chat history as list of messages (gzip JSON,
+# reads fall back to uncompressed objects written by older versions)
+chat_history_repo = S3Repository(
+    "{id}.json.gz",
+    default_factory=list,
+    compress=True,
+    legacy_key_pattern="{id}.json",
+)
+
+# In-memory cache: {chat_id: list of messages}, least recently used first
+_history_cache = OrderedDict()
+
+# Write-behind state: histories awaiting flush and their flush tasks
+_dirty = {}  # {chat_id: list of messages}
+_flush_tasks = {}  # {chat_id: asyncio.Task}
+_saving = set()  # chat_ids whose flush task has a PUT in flight
+
+
+def _cache_put(key, history):
+    """Put history into LRU cache, evicting the least recently used chat"""
+    _history_cache[key] = history
+    _history_cache.move_to_end(key)
+    while len(_history_cache) > HISTORY_CACHE_SIZE:
+        _history_cache.popitem(last=False)
+
+
+def history_chars(history):
+    """Total length of message texts in history"""
+    return sum(len(message.get("content") or "") for message in history)
+
+
+async def _cached_history(key):
+    """Latest cached history list for key, loaded from S3 on a miss"""
+    history = _history_cache.get(key)
+    if history is None:
+        # Concurrent misses for one chat (e.g. photo prefetch + processing) share one GET
+        history = await coalesce(("history", key), lambda: asyncio.to_thread(chat_history_repo.get, key))
+        # A save may have cached a newer history while we were waiting
+        cached = _history_cache.get(key)
+        if cached is not None:
+            history = cached
+        else:
+            _cache_put(key, history)
+    _history_cache.move_to_end(key)
+    return history
+
+
+async def get_chat_history(chat_id):
+    """
+    Получить историю чата (из кеша или S3), deque не длиннее MAX_HISTORY_LENGTH
+    и с суммарным текстом не больше HISTORY_MAX_CHARS.
+
+    При переполнении старые сообщения отбрасываются блоком
+    HISTORY_TRIM_BLOCK, а не по одному: начало промпта не меняется
+    несколько ходов подряд и кеш промптов у провайдера срабатывает.
+    """
+    history = await _cached_history(str(chat_id))
+
+    if len(history) > MAX_HISTORY_LENGTH:
+        old_length = len(history)
+        # Leading system message is the rolling summary of older history, keep it
+        head = 1 if history[0].get("role") == "system" else 0
+        drop = old_length - MAX_HISTORY_LENGTH + HISTORY_TRIM_BLOCK
+        # Don't start the window with an orphaned assistant reply, but never
+        # skip past the last exchange (no later user turn: keep the last two)
+        while drop < old_length - 2 and history[drop].get("role") != "user":
+            drop += 1
+        del history[head:drop]
+        app_logger.info(
+            "History trimmed: chat_id=%s, old_length=%d, new_length=%d",
+            chat_id, old_length, len(history)
+        )
+
+    if HISTORY_MAX_CHARS:
+        _trim_to_char_budget(chat_id, history)
+    return deque(history)
+
 
+def _trim_to_char_budget(chat_id, history):
+    """Drop oldest messages (keeping summary and the last exchange) until text fits HISTORY_MAX_CHARS"""
+    total = history_chars(history)
+    if total <= HISTORY_MAX_CHARS:
+        return
 
-# Chat history repository: stores chat history as list of messages
-chat_history_repo = S3Repository("{id}.json", default_factory=list)
+    old_length = len(history)
+    head = 1 if history[0].get("role") == "system" else 0
+    drop = head
+    while total > HISTORY_MAX_CHARS and old_length - drop > 2:
+        total -= len(history[drop].get("content") or "")
+        drop += 1
+    # Don't start the window with an orphaned assistant reply, but never
+    # skip past the last exchange (no later user turn: keep the last two)
+    while drop < old_length - 2 and history[drop].get("role") != "user":
+        drop += 1
+    del history[head:drop]
+    app_logger.info(
+        "History trimmed to char budget: chat_id=%s, old_length=%d, new_length=%d",
+        chat_id, old_length, len(history)
+    )
 
 
-def get_chat_history(chat_id):
-    """Получить историю чата из S3"""
-    return chat_history_repo.get(str(chat_id))
+def _store(key, data):
+    """Put history into cache and schedule its flush to S3"""
+    _cache_put(key, data)
+    _dirty[key] = data
+    if key not in _flush_tasks:
+        _flush_tasks[key] = asyncio.create_task(_flush_later(key))
 
 
-def save_chat_history(chat_id, history):
-    """Сохранить историю чата в S3"""
-    return chat_history_repo.save(str(chat_id), history)
+async def save_chat_history(chat_id, history):
+    """Сохранить историю чата (в кеш сразу, в S3 — отложенно)"""
+    _store(str(chat_id), list(history))
+    return True
 
 
-def clear_chat_history(chat_id):
+async def append_chat_history(chat_id, messages):
+    """
+    Добавить сообщения в конец актуальной истории чата.
+
+    Пишет поверх того, что лежит в кеше сейчас, а не копии, прочитанной
+    до ответа модели: иначе конкурентная запись (сводка, очистка) теряется.
+    Возвращает новую историю (не изменять).
+    """
+    key = str(chat_id)
+    history = [*await _cached_history(key), *messages]
+    _store(key, history)
+    return history
+
+
+async def replace_chat_history_prefix(chat_id, prefix, replacement):
+    """
+    Заменить начальные сообщения prefix на replacement, сохранив остальное.
+
+    Возвращает False (ничего не меняя), если история уже не начинается
+    с prefix — её очистили или обрезали, пока готовилась замена.
+    """
+    key = str(chat_id)
+    history = await _cached_history(key)
+    if history[:len(prefix)] != list(prefix):
+        return False
+    _store(key, [*replacement, *history[len(prefix):]])
+    return True
+
+
+async def clear_chat_history(chat_id):
     """Очистить историю чата"""
-    return chat_history_repo.save(str(chat_id), [])
+    key = str(chat_id)
+    _cache_put(key, [])
+    if key in _flush_tasks:
+        # Pending flusher writes it after any in-flight PUT, keeping order
+        _dirty[key] = []
+        return True
+    _dirty.pop(key, None)
+    return await asyncio.to_thread(chat_history_repo.save, key, [])
+
+
+async def _flush_later(key):
+    """Wait for the debounce delay, then write the latest history to S3"""
+    try:
+        await asyncio.sleep(HISTORY_FLUSH_DELAY_SECONDS)
+        while key in _dirty:
+            data = _dirty.pop(key)
+            _saving.add(key)
+            try:
+                await asyncio.to_thread(chat_history_repo.save, key, data)
+            finally:
+                _saving.discard(key)
+    finally:
+        _flush_tasks.pop(key, None)
+
+
+async def warmup_chat_history(concurrency=32):
+    """
+    Load the most recently active chat histories into cache (call on startup).
+
+    Returns number of chats loaded.
+    """
+    keys = await asyncio.to_thread(chat_history_repo.list_recent_ids, limit=HISTORY_CACHE_SIZE)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def load(key):
+        async with semaphore:
+            return await asyncio.to_thread(chat_history_repo.get, key)
+
+    results = await asyncio.gather(*[load(key) for key in keys], return_exceptions=True)
+
+    # Insert oldest first so the most recently active chats end up most recently used
+    loaded = 0
+    for key, history in reversed(list(zip(keys, results))):
+        if isinstance(history, Exception) or key in _history_cache:
+            continue
+        _cache_put(key, history)
+        loaded += 1
+    return loaded
+
+
+async def flush_chat_history():
+    """Write all pending histories to S3 now (call on shutdown)"""
+    tasks = list(_flush_tasks.items())
+    for key, task in tasks:
+        # Still in the debounce delay: cancel, its data is written below.
+        # A PUT in flight can't be cancelled (it runs in a thread) and an older
+        # PUT landing after ours would overwrite newer history, so let that
+        # task finish: it writes newer data itself before exiting.
+        if key not in _saving:
+            task.cancel()
+    await asyncio.gather(*(task for _, task in tasks), return_exceptions=True)
+
+    pending = list(_dirty.items())
+    _dirty.clear()
+    for key, data in pending:
+        await asyncio.to_thread(chat_history_repo.save, key, data)
+    if pending:
+        app_logger.info(f"Flushed {len(pending)} pending chat histories")
@@ -0,0 +1,45 @@
+"""
+Image storage operations (uploaded photos for vision requests).
+
+Images are stored under the "images/" prefix only for the duration of one
+request: ai.processor deletes each one after the completion. Objects left
+behind by a crash are not cleaned up by the bot; add a bucket lifecycle
+rule expiring "images/" (e.g. after 1 day) as a backstop.
+"""
+
+import uuid
+from config import S3_BUCKET, VISION_IMAGE_URL_TTL_SECONDS
+from storage.s3_client import get_s3_client
+
+
+def upload_image(chat_id, image_content, content_type="image/jpeg"):
+    """
+    Загрузить изображение в S3 и вернуть presigned URL для чтения.
+
+    Args:
+        chat_id: Telegram chat ID (used as key prefix)
+        image_content: Image bytes
+        content_type: MIME type of the image
+
+    Returns:
+        (presigned GET URL valid for VISION_IMAGE_URL_TTL_SECONDS, S3 key)
+    """
+    s3_client = get_s3_client()
+    key = f"images/{chat_id}/{uuid.uuid4().hex}.jpg"
+    s3_client.put_object(
+        Bucket=S3_BUCKET,
+        Key=key,
+        Body=image_content,
+        ContentType=content_type,
+    )
+    url = s3_client.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": S3_BUCKET, "Key": key},
+        ExpiresIn=VISION_IMAGE_URL_TTL_SECONDS,
+    )
+    return url, key
+
+
+def delete_image(key):
+    """Удалить изображение, загруженное upload_image"""
+    get_s3_client().delete_object(Bucket=S3_BUCKET, Key=key)
@@ -3,17 +3,32 @@ S3 client creation.
 """
 
 import os
+import functools
 import boto3
+from botocore.config import Config
 from config import S3_KEY_ID, S3_KEY_SECRET
 
 
+@functools.lru_cache(maxsize=1)
 def get_s3_client():
-    """Create and return S3 client"""
+    """
+    Create S3 client once and return it on every call.
+
+    boto3 clients are thread-safe, so one client (and its connection pool)
+    is shared by all repositories and worker threads.
+    """
     session = boto3.session.Session(
         aws_access_key_id=S3_KEY_ID, aws_secret_access_key=S3_KEY_SECRET
     )
     # Используй переменную окружения MINIO_ENDPOINT для своего S3
     endpoint_url = os.environ.get("MINIO_ENDPOINT", "https://storage.yandexcloud.net")
     return session.client(
-        service_name="s3", endpoint_url=endpoint_url
+        service_name="s3",
+        endpoint_url=endpoint_url,
+        config=Config(
+            max_pool_connections=50,
+            retries={"max_attempts": 3, "mode": "standard"},
+            # Keep idle pooled connections alive between sparse requests
+            tcp_keepalive=True,
+        ),
     )
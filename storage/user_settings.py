@@ -1,28 +1,68 @@
 """
 User settings storage operations.
+
+Settings are cached in-process (LRU, write-through): only this bot changes
+them, so after the first read a chat's model/prompt never needs an S3 GET.
+Functions are blocking (boto3) and may run in worker threads.
 """
 
+import threading
+from collections import OrderedDict
+from config import SETTINGS_CACHE_SIZE
 from storage.base import S3Repository
 
 
 # User settings repository: stores user preferences as dict
 user_settings_repo = S3Repository("{id}_settings.json", default_factory=dict)
 
+DEFAULT_MODEL = "glm-4.7"
+
+# In-memory cache: {chat_id: settings dict}, least recently used first
+_settings_cache = OrderedDict()
+_settings_lock = threading.Lock()
+
+
+def _cache_put(key, settings):
+    """Put settings into LRU cache (caller holds the lock)"""
+    _settings_cache[key] = settings
+    _settings_cache.move_to_end(key)
+    while len(_settings_cache) > SETTINGS_CACHE_SIZE:
+        _settings_cache.popitem(last=False)
+
 
 def get_user_settings(chat_id):
-    """Получить настройки пользователя из S3"""
-    return user_settings_repo.get(str(chat_id))
+    """Получить настройки пользователя (из кеша или S3); возвращает копию"""
+    key = str(chat_id)
+    with _settings_lock:
+        settings = _settings_cache.get(key)
+        if settings is not None:
+            _settings_cache.move_to_end(key)
+            return dict(settings)
+
+    settings = user_settings_repo.get(key)
+    with _settings_lock:
+        # Don't overwrite a value saved while we were reading from S3
+        if key not in _settings_cache:
+            _cache_put(key, settings)
+    return dict(settings)
 
 
 def save_user_settings(chat_id, settings):
-    """Сохранить настройки пользователя в S3"""
-    return user_settings_repo.save(str(chat_id), settings)
+    """Сохранить настройки пользователя в S3 (и обновить кеш)"""
+    key = str(chat_id)
+    success = user_settings_repo.save(key, settings)
+    with _settings_lock:
+        if success:
+            _cache_put(key, dict(settings))
+        else:
+            _settings_cache.pop(key, None)
+    return success
 
 
 def get_user_model(chat_id):
     """Получить выбранную модель пользователя или дефолтную"""
     settings = get_user_settings(chat_id)
-    return settings.get("model", "glm-4.7")
+    return settings.get("model", DEFAULT_MODEL)
 
 
 def set_user_model(chat_id, model):
@@ -0,0 +1,9 @@
+"""
+Shared test setup: placeholder values for settings config requires at import.
+"""
+
+import os
+
+os.environ.setdefault("ADMIN_CHAT_ID", "0")
+os.environ.setdefault("TG_BOT_TOKEN", "123:test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
@@ -0,0 +1,177 @@
+"""
+Tests for chat history trimming and concurrent writes (storage/chat_history.py).
+"""
+
+import asyncio
+import types
+
+import pytest
+
+from ai import history_summary
+from storage import chat_history
+
+
+def _msg(role, content):
+    return {"role": role, "content": content}
+
+
+def test_char_budget_keeps_last_exchange_without_later_user_turn(monkeypatch):
+    monkeypatch.setattr(chat_history, "HISTORY_MAX_CHARS", 10)
+    history = [
+        _msg("user", "u" * 50),
+        _msg("assistant", "a" * 50),
+        _msg("assistant", "b" * 50),
+        _msg("assistant", "c" * 50),
+    ]
+
+    chat_history._trim_to_char_budget(1, history)
+
+    assert history == [_msg("assistant", "b" * 50), _msg("assistant", "c" * 50)]
+
+
+def test_char_budget_keeps_summary_head(monkeypatch):
+    monkeypatch.setattr(chat_history, "HISTORY_MAX_CHARS", 25)
+    summary = _msg("system", "summary")
+    history = [
+        summary,
+        _msg("user", "u" * 10),
+        _msg("assistant", "a" * 10),
+        _msg("user", "v" * 5),
+        _msg("assistant", "b" * 5),
+    ]
+
+    chat_history._trim_to_char_budget(1, history)
+
+    assert history == [summary, _msg("user", "v" * 5), _msg("assistant", "b" * 5)]
+
+
+class _FakeRepo:
+    """In-memory stand-in for the S3 chat history repository"""
+
+    def __init__(self):
+        self.saved = {}
+
+    def get(self, key):
+        return list(self.saved.get(key, []))
+
+    def save(self, key, data):
+        self.saved[key] = list(data)
+        return True
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cache(monkeypatch):
+    monkeypatch.setattr(chat_history, "chat_history_repo", _FakeRepo())
+    monkeypatch.setattr(chat_history, "HISTORY_MAX_CHARS", 0)
+    monkeypatch.setattr(chat_history, "MAX_HISTORY_LENGTH", 5)
+    monkeypatch.setattr(chat_history, "HISTORY_TRIM_BLOCK", 2)
+    chat_history._history_cache.clear()
+    chat_history._dirty.clear()
+    chat_history._flush_tasks.clear()
+    yield
+    chat_history._history_cache.clear()
+    chat_history._dirty.clear()
+    chat_history._flush_tasks.clear()
+
+
+def _trimmed(history):
+    chat_history._cache_put("1", history)
+    return list(asyncio.run(chat_history.get_chat_history(1)))
+
+
+def test_trim_starts_window_on_user_turn():
+    history = [
+        _msg("user", "u0"),
+        _msg("assistant", "a0"),
+        _msg("user", "u1"),
+        _msg("assistant", "a1"),
+        _msg("assistant", "a1b"),
+        _msg("user", "u2"),
+        _msg("assistant", "a2"),
+    ]
+
+    assert _trimmed(history) == [_msg("user", "u2"), _msg("assistant", "a2")]
+
+
+def test_trim_keeps_summary_head():
+    summary = _msg("system", "summary")
+    history = [
+        summary,
+        _msg("user", "u0"),
+        _msg("assistant", "a0"),
+        _msg("user", "u1"),
+        _msg("assistant", "a1"),
+        _msg("user", "u2"),
+        _msg("assistant", "a2"),
+    ]
+
+    assert _trimmed(history) == [summary, _msg("user", "u2"), _msg("assistant", "a2")]
+
+
+def test_trim_keeps_last_exchange_without_later_user_turn():
+    history = [_msg("user", "u0")] + [_msg("assistant", f"a{i}") for i in range(6)]
+
+    assert _trimmed(history) == [_msg("assistant", "a4"), _msg("assistant", "a5")]
+
+
+class _SlowCompletions:
+    """Summary model that answers only after the test releases it"""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def create(self, **kwargs):
+        self.started.set()
+        await self.release.wait()
+        message = types.SimpleNamespace(content="old stuff")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+async def _summarize_during(chat_id, concurrent_write, monkeypatch):
+    completions = _SlowCompletions()
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+    monkeypatch.setattr(history_summary, "client", client)
+    monkeypatch.setattr(history_summary, "openai_sem", asyncio.Semaphore(1))
+    monkeypatch.setattr(history_summary, "HISTORY_SUMMARY_MODEL", "summary-model")
+    monkeypatch.setattr(history_summary, "HISTORY_TRIM_BLOCK", 2)
+
+    task = asyncio.create_task(history_summary._summarize_history(chat_id))
+    await completions.started.wait()
+    await concurrent_write()
+    completions.release.set()
+    await task
+
+
+def test_summary_keeps_turn_saved_while_summarizing(monkeypatch):
+    chat_history._cache_put("1", [
+        _msg("user", "u0"),
+        _msg("assistant", "a0"),
+        _msg("user", "u1"),
+        _msg("assistant", "a1"),
+    ])
+    new_turn = [_msg("user", "u2"), _msg("assistant", "a2")]
+
+    asyncio.run(_summarize_during(
+        1, lambda: chat_history.append_chat_history(1, new_turn), monkeypatch
+    ))
+
+    summary = _msg("system", history_summary.SUMMARY_PREFIX + "old stuff")
+    assert chat_history._history_cache["1"] == [
+        summary, _msg("user", "u1"), _msg("assistant", "a1"), *new_turn
+    ]
+
+
+def test_summary_skipped_when_history_cleared_meanwhile(monkeypatch):
+    chat_history._cache_put("1", [
+        _msg("user", "u0"),
+        _msg("assistant", "a0"),
+        _msg("user", "u1"),
+        _msg("assistant", "a1"),
+    ])
+
+    asyncio.run(_summarize_during(
+        1, lambda: chat_history.clear_chat_history(1), monkeypatch
+    ))
+
+    assert chat_history._history_cache["1"] == []
@@ -0,0 +1,66 @@
+"""
+Tests for Markdown -> Telegram HTML conversion (utils/formatters.py).
+"""
+
+import pytest
+
+from utils.formatters import escape_html, escape_markdown_v2, markdown_to_html
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Text without markup (fast path)
+    ("", ""),
+    ("plain text", "plain text"),
+    ("Привет, мир", "Привет, мир"),
+    # HTML special characters
+    ("a < b & c > d", "a &lt; b &amp; c &gt; d"),
+    ("say \"hi\" it's", "say &quot;hi&quot; it&#x27;s"),
+    ("<b>not a tag</b> **bold**", "&lt;b&gt;not a tag&lt;/b&gt; <b>bold</b>"),
+    # Code blocks
+    ("```\nif a && b:\n    pass\n```", "<pre>\nif a &amp;&amp; b:\n    pass\n</pre>"),
+    ("```python\nx = 1\n```", "<pre>python\nx = 1\n</pre>"),
+    ("```**not bold** `not code`\n# not header```", "<pre>**not bold** `not code`\n# not header</pre>"),
+    ("```a``` and ```b```", "<pre>a</pre> and <pre>b</pre>"),
+    # Inline code
+    ("`x < y`", "<code>x &lt; y</code>"),
+    ("`a` and `b`", "<code>a</code> and <code>b</code>"),
+    ("**bold** and `**not bold**`", "<b>bold</b> and <code>**not bold**</code>"),
+    ("```block``` then `inline`", "<pre>block</pre> then <code>inline</code>"),
+    # Malformed markup is left as is
+    ("`unclosed code", "`unclosed code"),
+    ("**unclosed bold", "**unclosed bold"),
+    ("``", "``"),
+    # Placeholder-like text is never mistaken for saved code
+    ("\x01CB0\x02", "\x01CB0\x02"),
+    ("\x01CB0\x02 `y`", "\x01CB0\x02 <code>y</code>"),
+    ("`a` \x01IC5\x02", "<code>a</code> \x01IC5\x02"),
+    ("`a` \x01IC\x02", "<code>a</code> \x01IC\x02"),
+    # Other formatting
+    ("# Title", "<b>📌 Title</b>"),
+    ("## Section", "<b>▸ Section</b>"),
+    ("- item\n* other", "  • item\n  • other"),
+    ("1. first", "  1. first"),
+    ("*italic* ~~gone~~ __under__", "<i>italic</i> <s>gone</s> <u>under</u>"),
+    ("[link](http://x.y/?a=1&b=2)", '<a href="http://x.y/?a=1&amp;b=2">link</a>'),
+])
+def test_markdown_to_html(text, expected):
+    assert markdown_to_html(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    (None, ""),
+    ("", ""),
+    ("<a href='x'>&</a>", "&lt;a href=&#x27;x&#x27;&gt;&amp;&lt;/a&gt;"),
+])
+def test_escape_html(text, expected):
+    assert escape_html(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("plain", "plain"),
+    ("v1.2 (beta)!", "v1\\.2 \\(beta\\)\\!"),
+    ("Готово: 100%!", "Готово: 100%\\!"),
+    ("a_b*c", "a\\_b\\*c"),
+])
+def test_escape_markdown_v2(text, expected):
+    assert escape_markdown_v2(text) == expected
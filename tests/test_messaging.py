@@ -0,0 +1,38 @@
+"""
+Tests for splitting long messages into chunks (utils/messaging.py).
+"""
+
+import pytest
+
+from utils.messaging import _split_text_into_chunks
+
+
+@pytest.mark.parametrize("text, max_length, expected", [
+    ("", 10, []),
+    ("short", 10, ["short"]),
+    # Boundaries at exactly max_length
+    ("a" * 10, 10, ["a" * 10]),
+    ("aaaa\nbbbb", 9, ["aaaa\nbbbb"]),
+    ("aaaa\nbbbb", 8, ["aaaa", "bbbb"]),
+    ("aaaa\nbbbb\ncccc", 9, ["aaaa\nbbbb", "cccc"]),
+    # Blank lines at the start of a chunk are dropped, inside a chunk kept
+    ("\n\nabc", 10, ["abc"]),
+    ("aaaa\n\n\nbbbb", 4, ["aaaa", "bbbb"]),
+    ("ab\n\ncd", 10, ["ab\n\ncd"]),
+    ("abc\n\n", 3, ["abc"]),
+    # A single line longer than max_length is kept whole
+    ("x" * 25, 10, ["x" * 25]),
+    ("ab\n" + "x" * 25 + "\ncd", 10, ["ab", "x" * 25, "cd"]),
+])
+def test_split_text_into_chunks(text, max_length, expected):
+    assert _split_text_into_chunks(text, max_length) == expected
+
+
+def test_split_text_into_chunks_respects_limit_and_keeps_text():
+    lines = [f"line {i} " + "y" * (i % 7) for i in range(200)]
+    text = "\n".join(lines)
+
+    chunks = _split_text_into_chunks(text, 50)
+
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert "\n".join(chunks) == text
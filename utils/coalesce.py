@@ -0,0 +1,26 @@
+"""
+In-flight request coalescing.
+
+Concurrent callers asking for the same key share one running operation
+instead of issuing identical S3/API calls (or MCP connects) in parallel.
+"""
+
+import asyncio
+
+# Running operations: {key: asyncio.Task}
+_inflight = {}
+
+
+async def coalesce(key, coro_factory):
+    """
+    Run coro_factory() at most once per key at a time; all concurrent callers get its result.
+
+    The shared task is shielded, so a cancelled caller doesn't cancel it for the others.
+    Exceptions are propagated to every waiter.
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(coro_factory())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(task)
@@ -10,6 +10,8 @@ Provides reusable decorators for:
 All decorators support async functions.
 """
 
+import asyncio
+import logging
 from functools import wraps
 from core.telegram import bot, app_logger
 from auth.access_control import is_authorized, is_admin
@@ -44,7 +46,7 @@ def require_auth(admin_only=False):
                 # For other commands, is_authorized already handles the response
                 if func.__name__ in ['send_welcome', 'help_command']:
                     username = message.from_user.username
-                    status = get_user_status(username)
+                    status = await asyncio.to_thread(get_user_status, username)
 
                     # Invalid username check
                     if not username or not validate_username(username):
@@ -110,11 +112,10 @@ def log_command(func):
     """
     @wraps(func)
     async def wrapper(message):
-        command = message.text.split()[0] if message.text else "unknown"
-        username = message.from_user.username if message.from_user else "unknown"
-        app_logger.info(
-            f"Command {command}: user={username}, chat_id={message.chat.id}"
-        )
+        if app_logger.isEnabledFor(logging.INFO):
+            command = message.text.split(None, 1)[0] if message.text else "unknown"
+            username = message.from_user.username if message.from_user else "unknown"
+            app_logger.info("Command %s: user=%s, chat_id=%s", command, username, message.chat.id)
         return await func(message)
     return wrapper
 
@@ -1,7 +1,8 @@
 """
-Messaging utilities for sending long messages.
+Messaging utilities for sending long messages and downloading files.
 """
 
+import asyncio
 from core.telegram import bot, app_logger
 from config import MAX_MESSAGE_LENGTH
 from utils.formatters import markdown_to_html
@@ -40,6 +41,102 @@ async def send_long_message(chat_id, text, reply_to_message=None, parse_mode="HT
     await _send_message_chunks(chat_id, text, reply_to_message, parse_mode=None)
 
 
+class StreamingReply:
+    """
+    Reply that is shown while the answer is being generated.
+
+    The first update() sends a plain-text draft as a reply, later ones edit it.
+    finish() replaces the draft with the final formatted answer (or with
+    regular split messages if it doesn't fit into one).
+
+    update() never waits for Telegram: it only stores the latest text, and a
+    background task sends/edits the draft, skipping texts that were superseded
+    while an edit was in flight. So a slow edit doesn't stall reading the
+    completion stream.
+    """
+
+    def __init__(self, reply_to_message):
+        self.reply_to_message = reply_to_message
+        self.chat_id = reply_to_message.chat.id
+        self.draft = None
+        self.overflowed = False
+        self._pending = None  # latest partial text not shown yet
+        self._editor = None  # task showing pending text
+
+    def update(self, text):
+        """Show partial answer (returns immediately; errors are logged, never raised)"""
+        if self.overflowed:
+            return
+        if len(text) > MAX_MESSAGE_LENGTH:
+            # The rest will arrive with finish(); stop editing
+            text = text[:MAX_MESSAGE_LENGTH - 1] + "…"
+            self.overflowed = True
+
+        self._pending = text
+        if self._editor is None or self._editor.done():
+            self._editor = asyncio.create_task(self._show_pending())
+
+    async def _show_pending(self):
+        """Send/edit the draft with the latest text until nothing new is pending"""
+        while self._pending is not None:
+            text, self._pending = self._pending, None
+            try:
+                if self.draft is None:
+                    self.draft = await bot.reply_to(self.reply_to_message, text)
+                else:
+                    await bot.edit_message_text(text, self.chat_id, self.draft.message_id)
+            except Exception as e:
+                app_logger.warning(f"Failed to update streaming reply: chat_id={self.chat_id}, error={e}")
+
+    async def close(self):
+        """Drop pending partial text and wait for an edit in progress"""
+        self._pending = None
+        if self._editor is not None:
+            await self._editor
+
+    async def finish(self, text, parse_mode="HTML"):
+        """Show the final answer"""
+        # Don't let a partial edit land after the final one
+        await self.close()
+        if self.draft is None:
+            await send_long_message(self.chat_id, text, reply_to_message=self.reply_to_message, parse_mode=parse_mode)
+            return
+
+        formatted = markdown_to_html(text) if parse_mode == "HTML" else text
+        if len(formatted) <= MAX_MESSAGE_LENGTH:
+            try:
+                await bot.edit_message_text(formatted, self.chat_id, self.draft.message_id, parse_mode=parse_mode)
+                return
+            except Exception as e:
+                if "message is not modified" in str(e):
+                    return
+                app_logger.warning(f"Failed to edit final reply with {parse_mode}, falling back: {e}")
+
+        # Too long for one message (or edit failed): replace the draft
+        try:
+            await bot.delete_message(self.chat_id, self.draft.message_id)
+        except Exception as e:
+            app_logger.warning(f"Failed to delete streaming draft: chat_id={self.chat_id}, error={e}")
+        await send_long_message(self.chat_id, text, reply_to_message=self.reply_to_message, parse_mode=parse_mode)
+
+
+def get_command_args(message):
+    """
+    Text after the command ("/cmd args" or "/cmd@BotName args"), stripped.
+
+    Splits once at the first whitespace (space or newline), so multi-line
+    arguments are kept intact.
+    """
+    parts = message.text.split(None, 1)
+    return parts[1].strip() if len(parts) > 1 else ""
+
+
+async def download_telegram_file(file_id):
+    """Download a Telegram file (photo, voice, ...) by its file_id and return bytes"""
+    file_info = await bot.get_file(file_id)
+    return await bot.download_file(file_info.file_path)
+
+
 async def _send_message_chunks(chat_id, text, reply_to_message, parse_mode):
     """
     Internal function to send message chunks.
@@ -80,21 +177,25 @@ def _split_text_into_chunks(text, max_length):
         List of text chunks
     """
     chunks = []
-    current_chunk = ""
+    # Lines of the current chunk and its joined length (joined once per chunk)
+    current_lines = []
+    current_length = 0
 
     for line in text.split('\n'):
         # If adding this line would exceed limit, save current chunk
-        if len(current_chunk) + len(line) + 1 > max_length:
-            if current_chunk:
-                chunks.append(current_chunk)
-            current_chunk = line
+        if current_length + len(line) + 1 > max_length:
+            if current_length:
+                chunks.append('\n'.join(current_lines))
+            current_lines = [line]
+            current_length = len(line)
+        elif current_length:
+            current_lines.append(line)
+            current_length += len(line) + 1
         else:
-            if current_chunk:
-                current_chunk += '\n' + line
-            else:
-                current_chunk = line
+            current_lines = [line]
+            current_length = len(line)
 
-    if current_chunk:
-        chunks.append(current_chunk)
+    if current_length:
+        chunks.append('\n'.join(current_lines))
 
     return chunks
@@ -3,12 +3,13 @@ Rate limiting utilities.
 """
 
 import time
+from collections import deque
 from config import RATE_LIMIT_REQUESTS, RATE_LIMIT_WINDOW
 from core.telegram import app_logger
 
 # Global rate limit data (in-memory; single-process only)
 # Для multi-worker используйте общее хранилище (Redis) и TTL ключи.
-rate_limit_data = {}  # {chat_id: [timestamp1, timestamp2, ...]}
+rate_limit_data = {}  # {chat_id: deque([timestamp1, timestamp2, ...])}, oldest first
 
 
 def check_rate_limit(chat_id):
@@ -16,29 +17,26 @@ def check_rate_limit(chat_id):
     Проверка rate limit для пользователя.
     Возвращает (allowed: bool, wait_time: int).
     """
-    current_time = time.time()
+    current_time = time.monotonic()
 
-    # Получаем или создаем список запросов для пользователя
-    if chat_id not in rate_limit_data:
-        rate_limit_data[chat_id] = []
+    # Получаем или создаем очередь запросов для пользователя
+    requests = rate_limit_data.get(chat_id)
+    if requests is None:
+        requests = rate_limit_data[chat_id] = deque()
 
-    # Удаляем старые записи (старше RATE_LIMIT_WINDOW секунд)
-    rate_limit_data[chat_id] = [
-        timestamp for timestamp in rate_limit_data[chat_id]
-        if current_time - timestamp < RATE_LIMIT_WINDOW
-    ]
+    # Удаляем старые записи (старше RATE_LIMIT_WINDOW секунд) с начала очереди
+    while requests and current_time - requests[0] >= RATE_LIMIT_WINDOW:
+        requests.popleft()
 
     # Проверяем лимит
-    if len(rate_limit_data[chat_id]) >= RATE_LIMIT_REQUESTS:
-        oldest_request = rate_limit_data[chat_id][0]
-        wait_time = int(RATE_LIMIT_WINDOW - (current_time - oldest_request))
+    if len(requests) >= RATE_LIMIT_REQUESTS:
+        wait_time = int(RATE_LIMIT_WINDOW - (current_time - requests[0]))
         app_logger.warning(
-            f"Rate limit exceeded: chat_id={chat_id}, "
-            f"requests={len(rate_limit_data[chat_id])}, "
-            f"wait_time={wait_time}s"
+            "Rate limit exceeded: chat_id=%s, requests=%d, wait_time=%ds",
+            chat_id, len(requests), wait_time
         )
         return False, wait_time
 
     # Добавляем текущий запрос
-    rate_limit_data[chat_id].append(current_time)
+    requests.append(current_time)
     return True, 0
@@ -0,0 +1,33 @@
+"""
+JSON serialization helpers.
+
+Uses orjson when installed (faster encode/decode), falls back to stdlib json.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+
+def json_loads(data):
+    """Parse JSON from str or bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj):
+    """Serialize object to JSON str (non-ASCII kept as is, like orjson)"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def json_dumpb(obj):
+    """Serialize object to UTF-8 JSON bytes (e.g. for S3 Body)"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
@@ -8,25 +8,27 @@ from core.telegram import bot, app_logger
 
 # Async task management
 typing_tasks = {}  # {chat_id: asyncio.Task}
+typing_refs = {}  # {chat_id: number of requests in progress that want the indicator}
 
 
-async def start_typing(chat_id):
-    """Start typing indicator for a specific chat"""
+async def start_typing(chat_id, action="typing"):
+    """Start typing indicator (or another chat action, e.g. "record_voice") for a specific chat"""
+    typing_refs[chat_id] = typing_refs.get(chat_id, 0) + 1
     if chat_id in typing_tasks:
         # Already typing for this chat
         return
 
     # Create and store the typing task
-    task = asyncio.create_task(typing_loop(chat_id))
+    task = asyncio.create_task(typing_loop(chat_id, action))
     typing_tasks[chat_id] = task
 
 
-async def typing_loop(chat_id):
-    """Send typing action in a loop"""
+async def typing_loop(chat_id, action="typing"):
+    """Send chat action in a loop"""
     try:
         while True:
             try:
-                await bot.send_chat_action(chat_id, "typing")
+                await bot.send_chat_action(chat_id, action)
             except Exception as e:
                 app_logger.error(f"Error sending typing action for chat {chat_id}: {e}")
                 break
@@ -37,12 +39,18 @@ async def typing_loop(chat_id):
 
 
 async def stop_typing(chat_id):
-    """Stop typing indicator for a specific chat"""
-    if chat_id in typing_tasks:
-        task = typing_tasks[chat_id]
+    """Stop typing indicator for a specific chat (once no other request in it is still running)"""
+    refs = typing_refs.get(chat_id, 0) - 1
+    if refs > 0:
+        typing_refs[chat_id] = refs
+        return
+    typing_refs.pop(chat_id, None)
+
+    # Remove before awaiting so a concurrent start_typing creates a fresh task
+    task = typing_tasks.pop(chat_id, None)
+    if task is not None:
         task.cancel()
         try:
             await task
         except asyncio.CancelledError:
             pass
-        del typing_tasks[chat_id]